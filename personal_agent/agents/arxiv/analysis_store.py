@@ -0,0 +1,130 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Iterable, Optional
+
+ANALYSIS_DB_FILENAME = ".analyses.sqlite3"
+
+
+def paper_version(paper_id: str) -> str:
+    """The explicit arXiv version of an id ('v2' for '2401.12345v2'), or 'latest'"""
+    match = re.search(r"v(\d+)$", paper_id)
+    return f"v{match.group(1)}" if match else "latest"
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class AnalysisStore:
+    """Durable store of deep-paper-analysis results.
+
+    Entries are keyed by (paper id, version, prompt version, model) and carry
+    a hash of the paper text they were generated from; an entry whose hash no
+    longer matches the stored paper is treated as stale and dropped.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    paper_id TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    analysis TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (paper_id, version, prompt_version, model)
+                )
+            """)
+
+    @classmethod
+    def for_storage(cls, storage_path: str) -> "AnalysisStore":
+        return cls(os.path.join(storage_path, ANALYSIS_DB_FILENAME))
+
+    @staticmethod
+    def _row(row) -> dict:
+        paper_id, version, prompt_version, model, hash_, analysis, created_at = row
+        return {
+            "paper_id": paper_id,
+            "version": version,
+            "prompt_version": prompt_version,
+            "model": model,
+            "content_hash": hash_,
+            "analysis": analysis,
+            "created_at": created_at,
+        }
+
+    def get(
+        self,
+        paper_id: str,
+        prompt_version: str,
+        models: Iterable[str],
+        paper_hash: str
+    ) -> Optional[dict]:
+        """Return the stored analysis from the first of `models` that has a fresh one"""
+        version = paper_version(paper_id)
+        with self._lock:
+            for model in models:
+                row = self._conn.execute(
+                    "SELECT * FROM analyses WHERE paper_id = ? AND version = ? AND prompt_version = ? AND model = ?",
+                    (paper_id, version, prompt_version, model)
+                ).fetchone()
+                if row is None:
+                    continue
+                entry = self._row(row)
+                if entry["content_hash"] == paper_hash:
+                    return entry
+
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM analyses WHERE paper_id = ? AND version = ? AND prompt_version = ? AND model = ?",
+                        (paper_id, version, prompt_version, model)
+                    )
+        return None
+
+    def latest(self, paper_id: str, prompt_version: str, paper_hash: str) -> Optional[dict]:
+        """Most recent fresh analysis of a paper from any model"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM analyses WHERE paper_id = ? AND version = ? AND prompt_version = ? "
+                "AND content_hash = ? ORDER BY created_at DESC LIMIT 1",
+                (paper_id, paper_version(paper_id), prompt_version, paper_hash)
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def put(
+        self,
+        paper_id: str,
+        prompt_version: str,
+        model: str,
+        paper_hash: str,
+        analysis: str
+    ) -> dict:
+        entry = {
+            "paper_id": paper_id,
+            "version": paper_version(paper_id),
+            "prompt_version": prompt_version,
+            "model": model,
+            "content_hash": paper_hash,
+            "analysis": analysis,
+            "created_at": time.time(),
+        }
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                tuple(entry.values())
+            )
+        return entry
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,4 +1,5 @@
 import os
+import json
 import asyncio
 from textwrap import dedent
 from typing import Any, AsyncIterable, Optional, List
@@ -6,15 +7,36 @@ from datetime import datetime, timedelta
 
 from google.adk import Agent
 from google.adk.artifacts import InMemoryArtifactService
-from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
+from google.adk.models import LlmRequest
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.adk.tools.tool_context import ToolContext
+from google.adk.tools.load_memory_tool import load_memory_tool
 from google.genai import types
-from google.adk.tools.mcp_tool.mcp_toolset import MCPToolset, StdioServerParameters
 
+from personal_agent.agents.tool_budget import ToolResultBudget
 from personal_agent.mcp.client.arxiv import ArxivMCPClient
-from personal_agent.mcp.server.arxiv import ArxivMCPServerManager
+from personal_agent.mcp.client.manifest import PaperManifest
+from personal_agent.mcp.server.arxiv import ArxivMCPServerManager, DEFAULT_STORAGE_PATH
+from personal_agent.models import ModelConfig, ARXIV_STAGE, DEEP_ANALYSIS_STAGE
+from personal_agent.usage import usage_ledger
+from .analysis_store import AnalysisStore, content_hash
+
+# Bump when the way analyze_paper_deeply frames the prompt changes
+ANALYSIS_FORMAT_VERSION = "1"
+
+
+def tool_result_json(tool_response: Any) -> dict:
+    """Decode the JSON payload of an MCP tool result, or {} if it has none"""
+    content = getattr(tool_response, 'content', None)
+    if not content or not hasattr(content[0], 'text'):
+        return {}
+    try:
+        result = json.loads(content[0].text)
+    except ValueError:
+        return {}
+    return result if isinstance(result, dict) else {}
+
 
 class ArxivResearchAgent:      
     SUPPORTED_CONTENT_TYPES = ['text', 'text/plain']
@@ -22,25 +44,187 @@ class ArxivResearchAgent:
     def __init__(
         self, 
         *, 
-        storage_path: str = './arxiv-mcp-server/papers'
+        storage_path: str = DEFAULT_STORAGE_PATH,
+        model_config: Optional[ModelConfig] = None,
+        mcp_server_url: Optional[str] = None,
+        traffic=None
     ):
         self.storage_path = storage_path
-        self.mcp_server = ArxivMCPServerManager(storage_path=self.storage_path)
-        """
+        self.model_config = model_config or ModelConfig()
+        # Optional record/replay harness (personal_agent.replay)
+        self.traffic = traffic
+        self.mcp_server = ArxivMCPServerManager(
+            storage_path=self.storage_path,
+            server_url=mcp_server_url,
+            traffic=traffic
+        )
+        self.manifest = PaperManifest(self.storage_path)
         self.mcp_client = ArxivMCPClient(
-            storage_path='./arxiv-mcp-server/papers',
-            server_manager=self.mcp_server
+            storage_path=self.storage_path,
+            server_manager=self.mcp_server,
+            manifest=self.manifest
         )
-        """
+        self.analysis_store = AnalysisStore.for_storage(self.storage_path)
+        self.analysis_llm = self.model_config.build(DEEP_ANALYSIS_STAGE)
+        if self.traffic:
+            self.traffic.instrument_llm(self.analysis_llm)
+        self.tool_budget = ToolResultBudget()
+        # (paper, prompt, model, content) -> {'task': generation, 'waiters': callers awaiting it}
+        self._analyses_in_flight = {}
 
         self.agent = None
         self.toolset = None
         self.exit_stack = None
 
     def start(self):
-        self.toolset = self.mcp_server.get_toolset()
+        # list_papers is answered from the local manifest by list_local_papers()
+        self.toolset = self.mcp_server.get_toolset(
+            tool_filter=['search_papers', 'download_paper', 'read_paper']
+        )
         self.agent = self._build_agent()
 
+    async def list_local_papers(
+        self,
+        query: str = "",
+        author: str = "",
+        offset: int = 0,
+        limit: int = 20
+    ) -> dict:
+        """Lists the papers that are already downloaded to local storage.
+
+        Args:
+            query: Text to match against paper ids and titles, empty for all papers.
+            author: Text to match against author names, empty for any author.
+            offset: Number of matching papers to skip, for pagination.
+            limit: Maximum number of papers to return.
+
+        Returns:
+            The total number of matching papers and one page of them, newest first.
+        """
+        return await asyncio.to_thread(
+            self.manifest.query,
+            text=query,
+            author=author,
+            offset=offset,
+            limit=limit
+        )
+
+    async def analyze_paper_deeply(self, paper_id: str) -> dict:
+        """Produces a comprehensive analysis of a downloaded paper.
+
+        Args:
+            paper_id: The arXiv id of a paper that has already been downloaded.
+
+        Returns:
+            The analysis text, the model that wrote it and whether it was
+            served from previously stored analyses.
+        """
+        paper = await self.mcp_client.read_paper(paper_id)
+        if paper.get('status') != 'success':
+            return {'status': 'error', 'message': paper.get('message', 'Paper is not available')}
+
+        llm = self.analysis_llm
+        prompt_version = await self._prompt_version()
+        paper_hash = content_hash(paper['content'])
+
+        # Users near their token budget get analyses from the downgrade model
+        models = list(llm.candidates)
+        if usage_ledger.downgrade_model and usage_ledger.downgrade_model not in models:
+            models.append(usage_ledger.downgrade_model)
+        stored = await asyncio.to_thread(
+            self.analysis_store.get, paper_id, prompt_version, models, paper_hash
+        )
+        if stored:
+            return self._analysis_result(stored, cached=True)
+
+        # Concurrent requests for the same paper share one generation
+        key = (paper_id, prompt_version, llm.model, paper_hash)
+        shared = self._analyses_in_flight.get(key)
+        if shared is None:
+            task = asyncio.ensure_future(
+                self._generate_analysis(llm, paper_id, paper['content'], prompt_version, paper_hash)
+            )
+            shared = self._analyses_in_flight[key] = {'task': task, 'waiters': 0}
+            task.add_done_callback(lambda _: self._forget_analysis(key, shared))
+
+        shared['waiters'] += 1
+        try:
+            # A cancelled caller must not cancel the generation others wait for
+            entry = await asyncio.shield(shared['task'])
+        finally:
+            shared['waiters'] -= 1
+            if not shared['waiters'] and not shared['task'].done():
+                # Every turn that wanted it was cancelled
+                self._forget_analysis(key, shared)
+                shared['task'].cancel()
+
+        if 'analysis' not in entry:
+            return entry
+        return self._analysis_result(entry, cached=False)
+
+    async def stored_analysis(self, paper_id: str) -> Optional[dict]:
+        """The newest stored analysis of the paper's current text under the current prompt, if any"""
+        paper = await self.mcp_client.read_paper(paper_id)
+        if paper.get('status') != 'success':
+            return None
+        return await asyncio.to_thread(
+            self.analysis_store.latest, paper_id, await self._prompt_version(), content_hash(paper['content'])
+        )
+
+    async def _prompt_version(self) -> str:
+        return f"{await self.mcp_client.prompt_version(DEEP_ANALYSIS_STAGE)}.{ANALYSIS_FORMAT_VERSION}"
+
+    def _forget_analysis(self, key, shared):
+        # A cancelled generation may finish after a new one took its key
+        if self._analyses_in_flight.get(key) is shared:
+            del self._analyses_in_flight[key]
+
+    async def _generate_analysis(self, llm, paper_id, content, prompt_version, paper_hash) -> dict:
+        prompt = await self.mcp_client.deep_analysis(paper_id)
+        if 'analysis' not in prompt:
+            return {'status': 'error', 'message': prompt.get('error', 'No analysis prompt')}
+
+        # The server prompt expects tool access to the paper; hand it the
+        # content directly so the analysis is a single call on the analysis model
+        request = LlmRequest(
+            model=llm.model,
+            contents=[types.Content(role='user', parts=[
+                types.Part(text=prompt['analysis']),
+                types.Part(text=f"Full content of paper {paper_id}:\n\n{content}"),
+            ])],
+            config=types.GenerateContentConfig()
+        )
+
+        texts = []
+        model = llm.model
+        async for response in llm.generate_content_async(request):
+            model = (response.custom_metadata or {}).get('model', model)
+            if response.content and response.content.parts:
+                texts.extend(part.text for part in response.content.parts if part.text)
+
+        if not texts:
+            return {'status': 'error', 'message': 'The model returned an empty analysis'}
+        return await asyncio.to_thread(
+            self.analysis_store.put, paper_id, prompt_version, model, paper_hash, ''.join(texts)
+        )
+
+    @staticmethod
+    def _analysis_result(entry: dict, cached: bool) -> dict:
+        return {
+            'status': 'success',
+            'paper_id': entry['paper_id'],
+            'model': entry['model'],
+            'cached': cached,
+            'analysis': entry['analysis']
+        }
+
+    async def _after_tool(self, tool, args, tool_context, tool_response):
+        # Keep titles/authors from searches so downloaded papers are listed with
+        # metadata; remember() may append to the manifest logs, so off the loop
+        if tool.name == 'search_papers':
+            await asyncio.to_thread(self.manifest.remember, tool_result_json(tool_response).get('papers', []))
+        return None
+
     def _build_agent(self) -> Agent:
         INSTRUCTION = dedent("""\
             You are an expert research assistant specializing in arXiv paper analysis. 
@@ -54,14 +238,19 @@ class ArxivResearchAgent:
             2. **Paper Analysis**: For individual papers:
             - Use download_arxiv_paper() to get the paper locally
             - Use read_arxiv_paper() to access content
-            - Use analyze_paper_deeply() for comprehensive analysis
+            - Use analyze_paper_deeply() for comprehensive analysis; stored analyses are returned instantly
 
             3. **Research Workflows**: For broader research:
             - Use research_topic_workflow() for complete topic investigation
             - This automatically searches, downloads, and analyzes multiple papers
 
             4. **Paper Management**: 
-            - Use list_downloaded_papers() to see what's available locally
+            - Use list_local_papers() to see what's available locally
+            - Filter with query/author and page through large libraries with offset/limit
+
+            5. **Past Research**:
+            - Use load_memory() before searching again; earlier sessions may already
+              cover the topic, the papers found and their analyses
 
             **Guidelines**:
             - Always download papers before trying to read or analyze them
@@ -69,6 +258,8 @@ class ArxivResearchAgent:
             - Provide paper IDs, titles, and key findings in your responses
             - Recommend relevant arXiv categories when appropriate
             - For recent research, use date filters (format: YYYY-MM-DD)
+            - Large tool results are replaced by a summary and a handle; use
+              read_tool_result() with the handle to read the parts you need
 
             **arXiv categories**:
             You can find the list of categories here: https://arxiv.org/category_taxonomy
@@ -82,7 +273,7 @@ class ArxivResearchAgent:
         """)
                     
         return Agent(
-            model='gemini-2.0-flash-001',
+            model=self.model_config.build(ARXIV_STAGE),
             name='arxiv_research_agent',
             description=dedent("""\
                 This agent helps researchers search, download, and analyze
@@ -91,9 +282,18 @@ class ArxivResearchAgent:
             """),
             instruction=INSTRUCTION,
             tools=[
-                self.toolset
+                self.toolset,
+                self.list_local_papers,
+                self.analyze_paper_deeply,
+                self.tool_budget.read_tool_result,
+                load_memory_tool
+            ],
+            after_tool_callback=[
+                self._after_tool,
+                self.tool_budget.after_tool
             ]
         )
     
     async def cleanup(self):
-        await self.mcp_server.shutdown()
\ No newline at end of file
+        await self.mcp_server.shutdown()
+        self.analysis_store.close()
\ No newline at end of file
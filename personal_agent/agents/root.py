@@ -0,0 +1,28 @@
+from textwrap import dedent
+
+from google.adk import Agent
+from google.adk.tools.load_memory_tool import load_memory_tool
+
+from personal_agent.models import DEFAULT_MODEL
+
+
+def create_root_agent(
+    *,
+    model=DEFAULT_MODEL,
+    sub_agents=None
+):
+    if sub_agents is None:
+        sub_agents = []
+
+    return Agent(
+        name="root_agent",
+        model=model,
+        description="The root agent of the personal agent",
+        instruction=dedent("""\
+            You are the root agent of the personal agent.
+            You are responsible for coordinating the other agents.
+            Use load_memory() to recall what was found in earlier sessions.
+        """),
+        tools=[load_memory_tool],
+        sub_agents=sub_agents
+    )
@@ -0,0 +1,118 @@
+import json
+from typing import Any, Optional
+
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+
+from personal_agent.metrics import inc
+
+READ_TOOL_NAME = "read_tool_result"
+
+
+def tool_result_text(tool_response: Any) -> str:
+    """Serialize a tool result the way it would be inlined into the session"""
+    content = getattr(tool_response, "content", None)
+    if content is not None and all(hasattr(part, "text") for part in content):
+        # MCP CallToolResult: the payload is the text of its content parts
+        return "".join(part.text for part in content)
+    if isinstance(tool_response, (dict, list)):
+        return json.dumps(tool_response, ensure_ascii=False, default=str)
+    return str(tool_response)
+
+
+def summarize(text: str, preview_chars: int) -> Any:
+    """Keep small JSON fields as they are and cut long strings down to a preview"""
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return {"preview": text[:preview_chars], "length": len(text)}
+
+    if not isinstance(data, dict):
+        return {"preview": text[:preview_chars], "length": len(text)}
+
+    summary = {}
+    for key, value in data.items():
+        serialized = json.dumps(value, ensure_ascii=False, default=str)
+        if len(serialized) <= 200:
+            summary[key] = value
+        elif isinstance(value, str):
+            summary[key] = {"preview": value[:preview_chars], "length": len(value)}
+        elif isinstance(value, list):
+            summary[key] = {"items": len(value), "first": value[:1]}
+        else:
+            summary[key] = {"truncated": True, "length": len(serialized)}
+    return summary
+
+
+class ToolResultBudget:
+    """Keeps oversized tool results out of the session.
+
+    Results above `max_bytes` are saved as session artifacts; the model only
+    sees a summary and a handle, and can page through the full result with
+    read_tool_result(). Without this, e.g. a full paper from read_paper is
+    resent to the model on every later turn.
+    """
+
+    def __init__(self, *, max_bytes: int = 16 * 1024, preview_chars: int = 1500):
+        self.max_bytes = max_bytes
+        self.preview_chars = preview_chars
+
+    async def after_tool(
+        self, tool, args: dict, tool_context: ToolContext, tool_response: Any
+    ) -> Optional[dict]:
+        if tool.name == READ_TOOL_NAME:
+            return None
+
+        text = tool_result_text(tool_response)
+        size = len(text.encode("utf-8"))
+        if size <= self.max_bytes:
+            return None
+
+        handle = f"tool-result-{tool.name}-{tool_context.function_call_id}.txt"
+        try:
+            await tool_context.save_artifact(handle, types.Part(text=text))
+        except ValueError:
+            # The runner has no artifact service; inline the result as before
+            return None
+
+        inc("tool_results_spilled_total", tool=tool.name)
+        inc("tool_result_bytes_spilled_total", size, tool=tool.name)
+        return {
+            "handle": handle,
+            "size_bytes": size,
+            "length": len(text),
+            "summary": summarize(text, self.preview_chars),
+            "note": f"Full result stored out of context. Use {READ_TOOL_NAME}() with this handle to read slices of it.",
+        }
+
+    async def read_tool_result(
+        self,
+        handle: str,
+        offset: int = 0,
+        length: int = 4000,
+        tool_context: ToolContext = None
+    ) -> dict:
+        """Reads a slice of a large tool result that was stored out of context.
+
+        Args:
+            handle: The handle returned in place of the large tool result.
+            offset: Character offset to start reading from.
+            length: Number of characters to read, at most 20000.
+
+        Returns:
+            The requested slice, the total length and the offset of the next slice.
+        """
+        artifact = await tool_context.load_artifact(handle)
+        if artifact is None or artifact.text is None:
+            return {"status": "error", "message": f"No stored result for handle {handle}"}
+
+        text = artifact.text
+        offset = max(offset, 0)
+        end = min(offset + max(min(length, 20000), 0), len(text))
+        return {
+            "handle": handle,
+            "offset": offset,
+            "length": len(text),
+            "content": text[offset:end],
+            "next_offset": end if end < len(text) else None,
+        }
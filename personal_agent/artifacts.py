@@ -0,0 +1,152 @@
+import os
+import time
+import shutil
+import asyncio
+from typing import Optional
+from urllib.parse import quote, unquote
+
+from google.adk.artifacts.base_artifact_service import BaseArtifactService
+from google.genai import types
+
+
+class LocalArtifactService(BaseArtifactService):
+    """Artifact service that keeps every artifact version as a JSON file on local disk.
+
+    Layout: <root>/<app>/<user>/<session or "user">/<filename>/<version>.json
+    Filenames prefixed with "user:" are shared across the user's sessions,
+    matching the ADK artifact namespaces. Session artifacts are removed with
+    delete_session() when the session ends, and by expire() when a previous
+    process left them behind.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _artifact_dir(self, app_name: str, user_id: str, session_id: str, filename: str) -> str:
+        scope = "user" if filename.startswith("user:") else quote(session_id, safe="")
+        return os.path.join(
+            self.root,
+            quote(app_name, safe=""),
+            quote(user_id, safe=""),
+            scope,
+            quote(filename, safe="")
+        )
+
+    @staticmethod
+    def _versions(path: str) -> list:
+        if not os.path.isdir(path):
+            return []
+        return sorted(
+            int(name[:-len(".json")])
+            for name in os.listdir(path)
+            if name.endswith(".json") and name[:-len(".json")].isdigit()
+        )
+
+    def _save(self, path: str, artifact: types.Part) -> int:
+        os.makedirs(path, exist_ok=True)
+        versions = self._versions(path)
+        version = versions[-1] + 1 if versions else 0
+
+        target = os.path.join(path, f"{version}.json")
+        with open(target + ".tmp", "w", encoding="utf-8") as f:
+            f.write(artifact.model_dump_json(exclude_none=True))
+        os.replace(target + ".tmp", target)
+        return version
+
+    def _load(self, path: str, version: Optional[int]) -> Optional[types.Part]:
+        versions = self._versions(path)
+        if not versions:
+            return None
+        if version is None:
+            version = versions[-1]
+        elif version not in versions:
+            return None
+
+        with open(os.path.join(path, f"{version}.json"), "r", encoding="utf-8") as f:
+            return types.Part.model_validate_json(f.read())
+
+    async def save_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        filename: str,
+        artifact: types.Part,
+    ) -> int:
+        path = self._artifact_dir(app_name, user_id, session_id, filename)
+        return await asyncio.to_thread(self._save, path, artifact)
+
+    async def load_artifact(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        filename: str,
+        version: Optional[int] = None,
+    ) -> Optional[types.Part]:
+        path = self._artifact_dir(app_name, user_id, session_id, filename)
+        return await asyncio.to_thread(self._load, path, version)
+
+    async def list_artifact_keys(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> list[str]:
+        keys = set()
+        for scope in (quote(session_id, safe=""), "user"):
+            path = os.path.join(self.root, quote(app_name, safe=""), quote(user_id, safe=""), scope)
+            if os.path.isdir(path):
+                keys.update(unquote(name) for name in os.listdir(path))
+        return sorted(keys)
+
+    async def delete_artifact(
+        self, *, app_name: str, user_id: str, session_id: str, filename: str
+    ) -> None:
+        path = self._artifact_dir(app_name, user_id, session_id, filename)
+
+        def delete():
+            for version in self._versions(path):
+                os.remove(os.path.join(path, f"{version}.json"))
+            if os.path.isdir(path) and not os.listdir(path):
+                os.rmdir(path)
+
+        await asyncio.to_thread(delete)
+
+    async def list_versions(
+        self, *, app_name: str, user_id: str, session_id: str, filename: str
+    ) -> list[int]:
+        path = self._artifact_dir(app_name, user_id, session_id, filename)
+        return await asyncio.to_thread(self._versions, path)
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        """Remove every artifact of the session, keeping the user-scoped ones"""
+        path = os.path.join(self.root, quote(app_name, safe=""), quote(user_id, safe=""), quote(session_id, safe=""))
+        await asyncio.to_thread(shutil.rmtree, path, ignore_errors=True)
+
+    def expire(self, max_age_seconds: float) -> int:
+        """Remove session artifact directories untouched for `max_age_seconds`; returns how many"""
+        cutoff = time.time() - max_age_seconds
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for app in os.scandir(self.root):
+            if not app.is_dir():
+                continue
+            for user in os.scandir(app.path):
+                if not user.is_dir():
+                    continue
+                for session in os.scandir(user.path):
+                    if session.name == "user" or not session.is_dir():
+                        continue
+                    if self._last_modified(session.path) < cutoff:
+                        shutil.rmtree(session.path, ignore_errors=True)
+                        removed += 1
+        return removed
+
+    @staticmethod
+    def _last_modified(path: str) -> float:
+        # Saving a version touches its filename directory, not the session's
+        latest = os.stat(path).st_mtime
+        for entry in os.scandir(path):
+            latest = max(latest, entry.stat().st_mtime)
+        return latest
@@ -0,0 +1,116 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque
+from typing import Optional
+
+from personal_agent.metrics import inc, set_gauge
+from personal_agent.tracing import create_trace
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Measures event-loop lag and, in debug mode, catches what blocks the loop.
+
+    A sampler task sleeps for `interval` and records how late it wakes up.
+    In debug mode a watchdog thread also checks the sampler's heartbeat; once
+    the loop has been unresponsive for `threshold` seconds it captures the
+    loop thread's stack, so the blocking callback can be found from its trace.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.1,
+        threshold: float = 0.1,
+        debug: bool = False,
+        window: int = 600,
+        keep_stalls: int = 20
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.debug = debug
+        self.lags = deque(maxlen=window)
+        self.stalls = deque(maxlen=keep_stalls)
+
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id = None
+        self._beat = time.monotonic()
+        self._stack = None
+
+    def start(self):
+        """Start sampling the running loop; must be called from the loop's thread"""
+        if self._task:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample())
+
+        if self.debug:
+            self._watchdog = threading.Thread(
+                target=self._watch, name="loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _sample(self):
+        while True:
+            started = self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._beat = time.monotonic()
+            self._record(max(self._beat - started - self.interval, 0.0), started)
+
+    def _record(self, lag: float, started: float):
+        self.lags.append(lag)
+        set_gauge("event_loop_lag_seconds", lag)
+        set_gauge("event_loop_lag_max_seconds", max(self.lags))
+        if lag < self.threshold:
+            return
+
+        # Only use a stack the watchdog captured during this sleep
+        captured, self._stack = self._stack, None
+        stack = captured[1] if captured and captured[0] == started else None
+
+        inc("event_loop_stalls_total")
+        inc("event_loop_stall_seconds_total", lag)
+        stall = {"lag_seconds": round(lag, 4), "at": time.time(), "stack": stack}
+        self.stalls.append(stall)
+
+        if stall["stack"]:
+            logger.warning(
+                "Event loop blocked for %.3fs in:\n%s", lag, "".join(stall["stack"])
+            )
+        # Queued by the Langfuse client; sent from its own thread
+        create_trace(name="event_loop_stall", input_data=stall)
+
+    def _watch(self):
+        poll = self.threshold / 2
+        while not self._stopped.wait(poll):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or (self._stack and self._stack[0] == beat):
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                # Read back by the sampler once the loop runs again
+                self._stack = (beat, traceback.format_stack(frame))
@@ -1,9 +1,9 @@
 import os
 import time
+import asyncio
 import json
 import argparse
 import signal
-from textwrap import dedent
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -12,19 +12,32 @@ load_dotenv()
 from fastapi import FastAPI, Request, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_mcp import FastApiMCP
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from google.genai.types import Content, Part
-from google.adk import Agent
 from google.adk.tools.agent_tool import AgentTool
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from contextlib import asynccontextmanager
 
 from personal_agent.agents import ArxivResearchAgent
+from personal_agent.agents.root import create_root_agent
+from personal_agent.artifacts import LocalArtifactService
+from personal_agent.loop_monitor import LoopMonitor
+from personal_agent.memory import LocalMemoryService
+from personal_agent.metrics import metrics, inc
+from personal_agent.models import ModelConfig, DEFAULT_MODEL, ROOT_STAGE
+from personal_agent.prerouter import PreRouter
+from personal_agent.replay import TrafficRecorder
 from personal_agent.query import Query
-from personal_agent.tracing import tracing_manager, create_trace, log_generation
+from personal_agent.router.arxiv import router as arxiv_router
+from personal_agent.router.debug import router as debug_router
+from personal_agent.scheduler import work_context, INTERACTIVE
+from personal_agent.streaming import TurnRegistry
+from personal_agent.tracing import tracing_manager, create_trace, create_span, log_generation
+from personal_agent.usage import usage_ledger, current_turn, track_turn
 
 DEFAULT_USER_ID = "user_id"
+DATA_PATH = os.getenv("PERSONAL_AGENT_DATA_PATH", "./.personal_agent")
 
 user_sessions = {}
 sessions = {}
@@ -33,10 +46,24 @@ session_timeout = 3 * 60 * 60  # 3 hours
 
 @asynccontextmanager
 async def lifespan(app):
-    arxiv_agent = ArxivResearchAgent()
+    # Reuse the agent started by main() so the runner and the /arxiv
+    # routes share one MCP client and paper manifest
+    arxiv_agent = getattr(app.state, "arxiv_agent", None) or ArxivResearchAgent()
     app.state.arxiv_agent = arxiv_agent
+    app.state.arxiv_client = arxiv_agent.mcp_client
+    app.state.session_manager = session_manager
+    # Spilled tool results of sessions that ended with the previous process
+    await asyncio.to_thread(artifact_service.expire, session_timeout)
+    loop_monitor.start()
     yield
+    await loop_monitor.stop()
+    # Let trace flushes and memory ingestion of the last turns finish
+    await asyncio.gather(*background_tasks, return_exceptions=True)
     await arxiv_agent.cleanup()
+    memory_service.close()
+    if traffic:
+        traffic.close()
+    await asyncio.to_thread(tracing_manager.flush)
 
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(
@@ -51,29 +78,23 @@ app.add_middleware(
     ],
     expose_headers=["*"]
 )
+app.include_router(arxiv_router)
+app.include_router(debug_router)
 
 session_manager = None
 runner = None
+pre_router = None
+model_config = ModelConfig()
+artifact_service = LocalArtifactService(os.path.join(DATA_PATH, "artifacts"))
+memory_service = LocalMemoryService(os.path.join(DATA_PATH, "memory.sqlite3"))
+background_tasks = set()
+loop_monitor = LoopMonitor(
+    threshold=float(os.getenv("PERSONAL_AGENT_SLOW_CALLBACK_MS", "100")) / 1000,
+    debug=os.getenv("PERSONAL_AGENT_LOOP_DEBUG", "").lower() in ("1", "true", "yes")
+)
+turn_registry = TurnRegistry()
 sub_agents = []
-
-def create_root_agent(
-    *,
-    model="gemini-2.0-flash-001",
-    sub_agents=None
-):
-    if sub_agents is None:
-        sub_agents = []
-
-    return Agent(
-        name="root_agent",
-        model=model,
-        description="The root agent of the personal agent",
-        instruction=dedent("""\
-            You are the root agent of the personal agent.
-            You are responsible for coordinating the other agents.
-        """),
-        sub_agents=sub_agents
-    )
+traffic = None
 
 class SessionManager:
     def __init__(self):
@@ -86,7 +107,7 @@ class SessionManager:
     def update_session_activity(self, user_id: str):
         self.session_last_active[user_id] = time.time()
     
-    def clear_expired_sessions(self):
+    async def clear_expired_sessions(self):
         current_time = time.time()
         expired_users = []
         
@@ -99,6 +120,12 @@ class SessionManager:
             if session_id:
                 self.sessions.pop(session_id, None)
                 self.session_last_active.pop(user_id, None)
+                # The session's spilled tool results are unreachable from now on
+                await artifact_service.delete_session(
+                    app_name="personal_agent",
+                    user_id=user_id,
+                    session_id=session_id
+                )
     
     def check_session(self, user_id: str):
         return user_id in self.user_sessions
@@ -125,15 +152,19 @@ class SessionManager:
             session_id = self.user_sessions[user_id]
         
         self.update_session_activity(user_id)
-        self.clear_expired_sessions()
+        await self.clear_expired_sessions()
         
         return session_id
 
 def create_runner(agent):
+    if traffic:
+        traffic.instrument_agent(agent)
     return Runner(
         app_name="personal_agent",
         agent=agent,
         session_service=session_manager.session_service,
+        artifact_service=artifact_service,
+        memory_service=memory_service,
     )
 
 
@@ -159,6 +190,33 @@ def clear_expired_sessions(self):
             self.session_last_active.pop(user_id, None)
 
 
+def run_query(text: str, user_id: str, session_id: str, trace=None):
+    """Start an agent turn, skipping the root agent when the pre-router is confident"""
+    content = Content(role="user", parts=[Part(text=text)])
+    if pre_router is None:
+        if traffic:
+            traffic.record_turn(user_id, session_id, text, runner.agent.name)
+        return runner.run_async(new_message=content, user_id=user_id, session_id=session_id)
+
+    decision = pre_router.route(text)
+    if traffic:
+        traffic.record_turn(user_id, session_id, text, decision.agent_name)
+    if trace:
+        saved = pre_router.root_hop_seconds if decision.runner else 0.0
+        create_span(
+            trace_id=trace.id if hasattr(trace, 'id') else None,
+            name="pre_route",
+            input_data={"query": text},
+            output_data=decision.to_dict(),
+            metadata={"estimated_latency_saved_s": saved}
+        )
+
+    if decision.runner:
+        return decision.runner.run_async(new_message=content, user_id=user_id, session_id=session_id)
+    return pre_router.timed_root_run(
+        runner.run_async(new_message=content, user_id=user_id, session_id=session_id)
+    )
+
 async def process_response(response_generator, trace=None):
     def serialize_tool_response(result):
         if result is None:
@@ -183,6 +241,7 @@ async def process_response(response_generator, trace=None):
     
     try:
         collected_response = []
+        response_author = ROOT_STAGE
         
         async for event in response_generator:
             if hasattr(event, "content") and hasattr(event.content, "parts"):
@@ -208,23 +267,40 @@ async def process_response(response_generator, trace=None):
                         # Collect response text for tracing
                         if role == "assistant":
                             collected_response.append(text_content)
+                            response_author = getattr(event, "author", None) or response_author
                         
                         yield f"event: message\ndata: {json.dumps({'role': role, 'content': text_content}, ensure_ascii=False)}\n\n"
         
         # Log the complete response to trace
         if trace and collected_response:
+            turn = current_turn.get()
             log_generation(
                 trace_id=trace.id if hasattr(trace, 'id') else None,
                 name="agent_response",
                 output_data={"response": "".join(collected_response)},
-                model="gemini-2.0-flash-001"
+                model=model_config.model_name(response_author),
+                usage=turn.to_langfuse() if turn else None,
+                metadata=usage_ledger.report(turn) if turn else None
             )
             
+    except asyncio.CancelledError:
+        if trace:
+            turn = current_turn.get()
+            log_generation(
+                trace_id=trace.id if hasattr(trace, 'id') else None,
+                name="agent_response_cancelled",
+                output_data={"response": "".join(collected_response)},
+                model=model_config.model_name(response_author),
+                usage=turn.to_langfuse() if turn else None,
+                metadata=usage_ledger.report(turn) if turn else None
+            )
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        # Flush traces at the end of the response
-        tracing_manager.flush()
+        # Flush traces at the end of the response; Langfuse's flush blocks
+        # until its queue is sent, so keep it off the event loop
+        start_background_task(asyncio.to_thread(tracing_manager.flush))
 
 @app.options("/{path:path}")
 async def options_handler(request: Request, path: str):
@@ -234,27 +310,89 @@ async def options_handler(request: Request, path: str):
 def greeting():
     return {"message": "Hello, I'm your personal assistant!"}
 
-@app.get("/query")
-async def query(q: str, request: Request):
-    user_id = request.cookies.get("user_id", DEFAULT_USER_ID)
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render())
+
+async def start_turn(
+    text: str,
+    user_id: str,
+    method: str,
+    priority: str = INTERACTIVE,
+    deadline_seconds: float = None
+):
+    retry_after = usage_ledger.retry_after(user_id, priority)
+    if retry_after is not None:
+        inc("turns_throttled_total", priority=priority)
+        raise HTTPException(
+            status_code=429,
+            detail="Token budget exceeded, try again later",
+            headers={"Retry-After": str(retry_after)}
+        )
+
     session_id = await session_manager.get_session_id(user_id)
 
     # Create trace for the query
     trace = create_trace(
         name="user_query",
-        input_data={"query": q, "method": "GET"},
+        input_data={"query": text, "method": method, "priority": priority},
         user_id=user_id
     )
 
-    content = Content(role="user", parts=[Part(text=q)])
-    response = runner.run_async(
-        new_message=content,
+    # The turn's task inherits the context, so its model and MCP calls are
+    # scheduled and accounted under this user, session and priority class
+    with work_context(priority, user_id, deadline_seconds, session_id), track_turn():
+        response = run_query(text, user_id, session_id, trace)
+        frames = remember_turn(process_response(response, trace), user_id, session_id)
+        return turn_registry.start(user_id, frames)
+
+async def remember_turn(frames, user_id: str, session_id: str):
+    async for frame in frames:
+        yield frame
+
+    # Ingest the finished turn into long-term memory without delaying the stream's end
+    start_background_task(add_session_to_memory(user_id, session_id))
+
+def start_background_task(coro):
+    """Run `coro` without awaiting it; shutdown waits for it and failures are logged"""
+    task = asyncio.ensure_future(coro)
+    background_tasks.add(task)
+    task.add_done_callback(finish_background_task)
+    return task
+
+def finish_background_task(task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Background task failed: {task.exception()!r}")
+
+async def add_session_to_memory(user_id: str, session_id: str):
+    session = await session_manager.session_service.get_session(
+        app_name="personal_agent",
         user_id=user_id,
-        session_id=session_id,
+        session_id=session_id
     )
+    if session:
+        await memory_service.add_session_to_memory(session)
+
+def get_last_event_id(request: Request):
+    # EventSource sends the header on reconnect; fetch-based clients can use the query param
+    return request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+
+@app.get("/query")
+async def query(q: str, request: Request):
+    user_id = request.cookies.get("user_id", DEFAULT_USER_ID)
+
+    # A reconnect resumes the running turn instead of asking the agent again
+    last_event_id = get_last_event_id(request)
+    turn, after = turn_registry.resume(last_event_id, user_id)
+    if last_event_id and turn is None:
+        # The turn is gone or fully delivered; 204 stops EventSource from reconnecting again
+        return Response(status_code=204)
+    if turn is None:
+        turn = await start_turn(q, user_id, "GET")
 
     return StreamingResponse(
-        process_response(response, trace), 
+        turn.subscribe(request, after), 
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -268,61 +406,81 @@ async def query(q: str, request: Request):
 @app.post("/query")
 async def query(query: Query, request: Request):
     user_id = request.cookies.get("user_id", DEFAULT_USER_ID)
-    session_id = await session_manager.get_session_id(user_id)
 
-    # Create trace for the query
-    trace = create_trace(
-        name="user_query",
-        input_data={"query": query.query, "method": "POST"},
-        user_id=user_id
-    )
-
-    content = Content(role="user", parts=[Part(text=query.query)])
-    response = runner.run_async(
-        new_message=content,
-        user_id=user_id,
-        session_id=session_id,
-    )
+    last_event_id = get_last_event_id(request)
+    turn, after = turn_registry.resume(last_event_id, user_id)
+    if last_event_id and turn is None:
+        return Response(status_code=204)
+    if turn is None:
+        turn = await start_turn(query.query, user_id, "POST", query.priority, query.deadline_seconds)
 
     return StreamingResponse(
-        process_response(response, trace), 
+        turn.subscribe(request, after), 
         media_type="text/event-stream"
     )
 
 def handle_signal(signum, frame):
-    print(f"Received signal {signum}, cleaning up...")
-    for agent in sub_agents:
-        if hasattr(agent, 'cleanup'):
-            agent.cleanup()
-    # Flush any remaining traces before exit
+    # uvicorn re-raises the signal after its graceful shutdown, where the
+    # lifespan already cleaned up the agents; the event loop is gone by now
+    print(f"Received signal {signum}, exiting...")
     tracing_manager.flush()
     exit(0)
 
-def get_sub_agents():
-    arxiv_agent = ArxivResearchAgent()
+def get_sub_agents(mcp_url=None):
+    arxiv_agent = ArxivResearchAgent(model_config=model_config, mcp_server_url=mcp_url, traffic=traffic)
     arxiv_agent.start()
+    app.state.arxiv_agent = arxiv_agent
 
     return [
         arxiv_agent.agent
     ]
 
+def create_pre_router(agents):
+    router = PreRouter()
+    for agent in agents:
+        router.add_runner(agent.name, create_runner(agent))
+    return router
+
 def main():
-    global session_manager, runner, sub_agents
+    global session_manager, runner, pre_router, model_config, sub_agents, traffic
     
     parser = argparse.ArgumentParser(description="Personal Agent Server")
-    parser.add_argument("--model", default="gemini-2.0-flash-001", 
-                       help="LLM model to use (default: gemini-2.0-flash-001)")
+    parser.add_argument("--model", default=None,
+                       help=f"Default LLM model for every agent (default: {DEFAULT_MODEL})")
+    parser.add_argument("--model-config", default=None,
+                       help="JSON file with per-stage models, fallbacks and timeouts "
+                            "(default: $PERSONAL_AGENT_MODEL_CONFIG)")
     parser.add_argument("--host", default="0.0.0.0", help="Host to bind to")
     parser.add_argument("--port", type=int, default=5050, help="Port to bind to")
+    parser.add_argument("--no-prerouter", action="store_true",
+                       help="Send every query through the root agent")
+    parser.add_argument("--loop-debug", action="store_true",
+                       help="Capture the stack of callbacks that block the event loop "
+                            "(default: $PERSONAL_AGENT_LOOP_DEBUG)")
+    parser.add_argument("--record", default=None, metavar="CASSETTE",
+                       help="Record model and MCP traffic to a cassette for `python -m personal_agent.replay`")
+    parser.add_argument("--mcp-url", default=None,
+                       help="Use a shared arxiv MCP server (`python -m personal_agent.mcp.server`) at this "
+                            "SSE or streamable HTTP URL instead of starting one (default: $ARXIV_MCP_SERVER_URL)")
     
     args = parser.parse_args()
     
+    model_config = ModelConfig.load(args.model_config, default_model=args.model)
+    if args.loop_debug:
+        loop_monitor.debug = True
+    if args.record:
+        traffic = TrafficRecorder(args.record, meta={
+            "model_config": model_config.to_dict(),
+            "prerouter": not args.no_prerouter,
+        })
     session_manager = SessionManager()
-    sub_agents = get_sub_agents()
-    root_agent = create_root_agent(model=args.model, sub_agents=sub_agents)
+    sub_agents = get_sub_agents(args.mcp_url)
+    root_agent = create_root_agent(model=model_config.build(ROOT_STAGE), sub_agents=sub_agents)
     runner = create_runner(root_agent)
+    if not args.no_prerouter:
+        pre_router = create_pre_router(sub_agents)
     
-    print(f"Starting Personal Agent with model: {args.model}")
+    print(f"Starting Personal Agent with model: {model_config.model_name(ROOT_STAGE)}")
     
     signal.signal(signal.SIGINT, handle_signal)
     signal.signal(signal.SIGTERM, handle_signal)
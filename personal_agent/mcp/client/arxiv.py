@@ -1,16 +1,15 @@
 import json
 import asyncio
-import os
+import hashlib
 from contextlib import asynccontextmanager
 from typing import Any, Optional, List
 
 from fastmcp.utilities.logging import get_logger
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-from mcp.client.sse import sse_client
+from mcp import ClientSession
 
-from personal_agent.mcp.server.arxiv import ArxivMCPServerManager
+from personal_agent.mcp.server.arxiv import ArxivMCPServerManager, DEFAULT_STORAGE_PATH
 from personal_agent.mcp.client.base import BaseMcpClient
+from personal_agent.mcp.client.manifest import PaperManifest
 
 logger = get_logger(__name__)
 
@@ -19,16 +18,26 @@ class ArxivMCPClient(BaseMcpClient):
         self, 
         *, 
         server_manager: Optional[ArxivMCPServerManager] = None,
-        storage_path: Optional[str] = None
+        storage_path: Optional[str] = None,
+        server_url: Optional[str] = None,
+        transport: Optional[str] = None,
+        manifest: Optional[PaperManifest] = None
     ):
-        self.storage_path = storage_path or os.path.expanduser("~/.arxiv-mcp-server/papers")
+        self.storage_path = storage_path or DEFAULT_STORAGE_PATH
 
         if server_manager is None:
-            self.server_manager = ArxivMCPServerManager(storage_path=self.storage_path)
+            self.server_manager = ArxivMCPServerManager(
+                storage_path=self.storage_path,
+                server_url=server_url,
+                transport=transport
+            )
         else:
             self.server_manager = server_manager
 
+        self.manifest = manifest or PaperManifest(self.storage_path)
+
         self.session: ClientSession = None  
+        self._prompt_versions = {}
         self._initialized = False
         self._initializing = False
 
@@ -55,13 +64,12 @@ class ArxivMCPClient(BaseMcpClient):
         self.session = None
 
     async def call_tool(self, tool_name: str, params: dict) -> dict:
-        await self._ensure_mcp_connection()
-        
         try:
             logger.info(f"Calling '{tool_name}' tool with params: {params}")
-            result = await self.session.call_tool(
-                name=tool_name,
-                arguments=params
+            # The session (ArxivClientSession) schedules the call and
+            # cancels it on the server if we stop waiting
+            result = await self._with_session(
+                lambda session: session.call_tool(name=tool_name, arguments=params)
             )
             
             if result.content and len(result.content) > 0:
@@ -77,13 +85,10 @@ class ArxivMCPClient(BaseMcpClient):
             raise e
     
     async def call_prompt(self, prompt_name: str, params: dict) -> dict:
-        await self._ensure_mcp_connection()
-        
         try:
             logger.info(f"Calling '{prompt_name}' prompt with params: {params}")
-            result = await self.session.get_prompt(
-                name=prompt_name,
-                arguments=params
+            result = await self._with_session(
+                lambda session: session.get_prompt(name=prompt_name, arguments=params)
             )
                 
             if result.messages and len(result.messages) > 0:
@@ -98,6 +103,20 @@ class ArxivMCPClient(BaseMcpClient):
             logger.warning(f"Prompt call failed: {e}")
             raise e
     
+    async def prompt_version(self, prompt_name: str) -> str:
+        """Short hash of a prompt's definition and the server version that serves it"""
+        if prompt_name not in self._prompt_versions:
+            result = await self._with_session(lambda session: session.list_prompts())
+            prompt = next((p for p in result.prompts if p.name == prompt_name), None)
+            server_info = self.server_manager.server_info
+            definition = json.dumps({
+                "server": server_info.model_dump() if server_info else None,
+                "prompt": prompt.model_dump() if prompt else prompt_name,
+            }, sort_keys=True)
+            self._prompt_versions[prompt_name] = hashlib.sha256(definition.encode()).hexdigest()[:16]
+
+        return self._prompt_versions[prompt_name]
+
     async def search_papers(
         self, 
         query: str, 
@@ -115,7 +134,9 @@ class ArxivMCPClient(BaseMcpClient):
         if categories:
             params["categories"] = categories
             
-        return await self.call_tool("search_papers", params)
+        result = await self.call_tool("search_papers", params)
+        await asyncio.to_thread(self.manifest.remember, result.get("papers", []))
+        return result
     
     async def download_paper(self, paper_id: str) -> dict:
         """Download a paper using persistent MCP client"""
@@ -125,9 +146,21 @@ class ArxivMCPClient(BaseMcpClient):
         """Read content of a downloaded paper"""
         return await self.call_tool("read_paper", {"paper_id": paper_id})
     
-    async def list_papers(self) -> dict:
-        """List all downloaded papers"""
-        return await self.call_tool("list_papers", {})
+    async def list_papers(
+        self,
+        query: Optional[str] = None,
+        author: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20
+    ) -> dict:
+        """List downloaded papers from the local manifest instead of the server's directory scan"""
+        return await asyncio.to_thread(
+            self.manifest.query,
+            text=query,
+            author=author,
+            offset=offset,
+            limit=limit
+        )
     
     async def deep_analysis(self, paper_id: str) -> dict:
         """Perform deep analysis using the built-in prompt"""
@@ -3,6 +3,7 @@ import json
 import asyncio
 import time
 import requests
+import anyio
 from pydantic import BaseModel
 
 from fastapi import Request, HTTPException, APIRouter
@@ -20,19 +21,31 @@ class BaseMcpClient:
         self._initializing = False
 
     async def _ensure_mcp_connection(self):
-        if self._initialized:
+        # The server manager replaces its session after a lost connection
+        if self._initialized and self.session is self.server_manager.session:
             return
         
         if self._initializing:
-            while not self._initialized:
+            while self._initializing:
                 await asyncio.sleep(0.1)
-            return
+            if self._initialized:
+                return
 
         self._initializing = True
+        try:
+            self.session = await self.server_manager.get_session()
+
+            self._initialized = True
+        finally:
+            # A failed connect must not leave later callers waiting forever
+            self._initializing = False
 
-        if self.session is None:
-            await self.server_manager.get_session()
-            self.session = self.server_manager.session
-            
-        self._initialized = True
-        self._initializing = False
\ No newline at end of file
+    async def _with_session(self, request):
+        """Await request(session), reconnecting once if the connection to the server was lost"""
+        await self._ensure_mcp_connection()
+        try:
+            return await request(self.session)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            await self.server_manager.reset_session(self.session)
+            await self._ensure_mcp_connection()
+            return await request(self.session)
@@ -0,0 +1,336 @@
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, List
+
+from fastmcp.utilities.logging import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_DIRNAME = ".manifest"
+PAPER_SUFFIX = ".md"
+SETTLE_SECONDS = 60
+
+
+def shard_key(paper_id: str, width: int = 4) -> str:
+    """Shard name for a paper id, e.g. '2401' for '2401.12345v2'"""
+    key = paper_id.replace("/", "_").replace(".", "")[:width]
+    return key or "_"
+
+
+def read_title(path: str, limit: int = 4096) -> Optional[str]:
+    """Best-effort title from the head of an extracted markdown file"""
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            head = f.read(limit)
+    except OSError:
+        return None
+
+    fallback = None
+    for line in head.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            return line.lstrip("#").strip().strip("*").strip() or fallback
+        if fallback is None:
+            fallback = line.strip("*").strip()[:200]
+    return fallback
+
+
+class PaperManifest:
+    """In-memory index of downloaded papers backed by sharded append-only logs.
+
+    The arxiv MCP server writes every paper as `<storage_path>/<paper_id>.md`,
+    so old-style ids such as `hep-th/9901001` end up one directory down.
+    Instead of globbing that directory and re-fetching metadata on every
+    `list_papers` call, entries are kept in a dict and persisted as one small
+    JSONL log per shard under `<storage_path>/.manifest/`.
+    """
+
+    def __init__(
+        self,
+        storage_path: str,
+        *,
+        shard_width: int = 4,
+        scan_interval: float = 2.0,
+        max_hints: int = 2048
+    ):
+        self.storage_path = storage_path
+        self.manifest_path = os.path.join(storage_path, MANIFEST_DIRNAME)
+        self.shard_width = shard_width
+        self.scan_interval = scan_interval
+        self.max_hints = max_hints
+
+        self.papers = {}
+        # Metadata seen in search results, applied once the paper is downloaded
+        self.hints = OrderedDict()
+
+        self._shard_lines = {}
+        self._shard_live = {}
+        # mtimes of the storage directory and its old-style archive directories
+        self._dir_mtimes = None
+        self._archive_dirs = set()
+        # Papers still being written by the server's PDF conversion thread
+        self._settling = set()
+        self._last_scan = 0.0
+        self._order = None
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def _shard_file(self, shard: str) -> str:
+        return os.path.join(self.manifest_path, f"{shard}.jsonl")
+
+    def _load(self):
+        """Replay the shard logs into memory"""
+        self._loaded = True
+        if not os.path.isdir(self.manifest_path):
+            return
+
+        for entry in os.scandir(self.manifest_path):
+            if not entry.name.endswith(".jsonl"):
+                continue
+            shard = entry.name[:-len(".jsonl")]
+            lines = 0
+            with open(entry.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash; the next compaction drops it
+                        continue
+                    if record.pop("op", "put") == "del":
+                        self.papers.pop(record["id"], None)
+                    else:
+                        self.papers[record["id"]] = record
+            self._shard_lines[shard] = lines
+
+        for paper_id in self.papers:
+            shard = shard_key(paper_id, self.shard_width)
+            self._shard_live[shard] = self._shard_live.get(shard, 0) + 1
+
+    def _append(self, records: List[dict]):
+        """Append records to their shard logs and compact shards that grew too large"""
+        os.makedirs(self.manifest_path, exist_ok=True)
+
+        by_shard = {}
+        for record in records:
+            by_shard.setdefault(shard_key(record["id"], self.shard_width), []).append(record)
+
+        for shard, shard_records in by_shard.items():
+            with open(self._shard_file(shard), "a", encoding="utf-8") as f:
+                for record in shard_records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._shard_lines[shard] = self._shard_lines.get(shard, 0) + len(shard_records)
+            self._maybe_compact(shard)
+
+    def _maybe_compact(self, shard: str):
+        # Cheap check against the live count from the last load/compaction first
+        if self._shard_lines.get(shard, 0) <= 2 * self._shard_live.get(shard, 0) + 64:
+            return
+
+        live = [
+            entry for paper_id, entry in self.papers.items()
+            if shard_key(paper_id, self.shard_width) == shard
+        ]
+        if self._shard_lines.get(shard, 0) <= 2 * len(live) + 64:
+            return
+
+        path = self._shard_file(shard)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in live:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+        self._shard_lines[shard] = len(live)
+        self._shard_live[shard] = len(live)
+
+    def _entry_for(self, paper_id: str, path: str, stat: os.stat_result) -> dict:
+        previous = self.papers.get(paper_id, {})
+        hint = self.hints.pop(paper_id, None) or {}
+
+        title = hint.get("title") or previous.get("title") or read_title(path)
+        return {
+            "id": paper_id,
+            "title": title,
+            "authors": hint.get("authors") or previous.get("authors") or [],
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "path": path,
+        }
+
+    def refresh(self, force: bool = False) -> int:
+        """Pick up papers added or removed since the last scan.
+
+        The storage directory's mtime changes whenever a file is created or
+        deleted in it, so an unchanged mtime lets us skip the scan entirely.
+        Only new or modified files are opened to extract a title.
+        Returns the number of entries that changed.
+        """
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                force = True
+
+            now = time.monotonic()
+            if not force and now - self._last_scan < self.scan_interval:
+                return 0
+            self._last_scan = now
+
+            try:
+                dir_mtimes = self._stat_dirs()
+            except FileNotFoundError:
+                return 0
+            if not force and dir_mtimes == self._dir_mtimes:
+                # Writes into an existing file don't touch the directory mtime,
+                # so re-stat only the papers that were recently written
+                return self._refresh_settling()
+            self._dir_mtimes = dir_mtimes
+
+            records = []
+            seen = set()
+            for paper_id, entry in self._scan():
+                seen.add(paper_id)
+
+                stat = entry.stat()
+                current = self.papers.get(paper_id)
+                if current and current["size"] == stat.st_size and current["mtime"] == stat.st_mtime:
+                    continue
+
+                record = self._entry_for(paper_id, entry.path, stat)
+                self.papers[paper_id] = record
+                records.append(record)
+                if time.time() - stat.st_mtime < SETTLE_SECONDS:
+                    self._settling.add(paper_id)
+
+            self._settling &= seen
+            for paper_id in [paper_id for paper_id in self.papers if paper_id not in seen]:
+                del self.papers[paper_id]
+                records.append({"op": "del", "id": paper_id})
+
+            if records:
+                self._order = None
+                self._append(records)
+                logger.info(f"Paper manifest updated with {len(records)} change(s)")
+
+            return len(records)
+
+    def _stat_dirs(self) -> dict:
+        mtimes = {self.storage_path: os.stat(self.storage_path).st_mtime_ns}
+        for path in self._archive_dirs:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                pass
+        return mtimes
+
+    def _scan(self):
+        """Yield (paper_id, DirEntry) for every paper file in storage"""
+        self._archive_dirs = set()
+        for entry in os.scandir(self.storage_path):
+            if entry.name.endswith(PAPER_SUFFIX) and entry.is_file():
+                yield entry.name[:-len(PAPER_SUFFIX)], entry
+            elif entry.is_dir() and not entry.name.startswith("."):
+                # Old-style ids: <archive>/<number>.md, e.g. hep-th/9901001
+                self._archive_dirs.add(entry.path)
+                for paper in os.scandir(entry.path):
+                    if paper.name.endswith(PAPER_SUFFIX) and paper.is_file():
+                        yield f"{entry.name}/{paper.name[:-len(PAPER_SUFFIX)]}", paper
+
+    def _refresh_settling(self) -> int:
+        records = []
+        for paper_id in list(self._settling):
+            current = self.papers.get(paper_id)
+            try:
+                stat = os.stat(current["path"])
+            except (OSError, TypeError):
+                self._settling.discard(paper_id)
+                continue
+
+            if time.time() - stat.st_mtime >= SETTLE_SECONDS:
+                self._settling.discard(paper_id)
+            if current["size"] != stat.st_size or current["mtime"] != stat.st_mtime:
+                record = self._entry_for(paper_id, current["path"], stat)
+                self.papers[paper_id] = record
+                records.append(record)
+
+        if records:
+            self._order = None
+            self._append(records)
+        return len(records)
+
+    def remember(self, papers: List[dict]):
+        """Keep title/author metadata from search results for later downloads"""
+        with self._lock:
+            updates = []
+            for paper in papers:
+                paper_id = paper.get("id")
+                if not paper_id:
+                    continue
+                hint = {"title": paper.get("title"), "authors": paper.get("authors") or []}
+
+                entry = self.papers.get(paper_id)
+                if entry is not None:
+                    changed = {key: value for key, value in hint.items() if value and entry.get(key) != value}
+                    if changed:
+                        entry.update(changed)
+                        updates.append(entry)
+                    continue
+
+                self.hints[paper_id] = hint
+                self.hints.move_to_end(paper_id)
+                while len(self.hints) > self.max_hints:
+                    self.hints.popitem(last=False)
+
+            if updates:
+                self._order = None
+                self._append(updates)
+
+    def get(self, paper_id: str) -> Optional[dict]:
+        self.refresh()
+        return self.papers.get(paper_id)
+
+    def query(
+        self,
+        *,
+        text: Optional[str] = None,
+        author: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20
+    ) -> dict:
+        """Return one page of papers, newest first, optionally filtered"""
+        self.refresh()
+
+        with self._lock:
+            if self._order is None:
+                self._order = sorted(
+                    self.papers.values(),
+                    key=lambda entry: entry["mtime"],
+                    reverse=True
+                )
+            entries = self._order
+
+        if text:
+            text = text.lower()
+            entries = [
+                entry for entry in entries
+                if text in entry["id"].lower() or text in (entry.get("title") or "").lower()
+            ]
+        if author:
+            author = author.lower()
+            entries = [
+                entry for entry in entries
+                if any(author in name.lower() for name in entry.get("authors") or [])
+            ]
+
+        offset = max(offset, 0)
+        limit = max(limit, 0)
+        return {
+            "total_papers": len(entries),
+            "offset": offset,
+            "limit": limit,
+            "papers": entries[offset:offset + limit],
+        }
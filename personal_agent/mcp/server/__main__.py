@@ -0,0 +1,34 @@
+import os
+import argparse
+
+from fastmcp import FastMCP
+from fastmcp.client.transports import StdioTransport
+
+from personal_agent.mcp.server.arxiv import arxiv_server_params, DEFAULT_STORAGE_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m personal_agent.mcp.server",
+        description="Serve one arxiv MCP server over SSE or streamable HTTP to every API worker"
+    )
+    parser.add_argument("--storage-path", default=DEFAULT_STORAGE_PATH,
+                        help="Paper cache; point the workers' storage path at the same directory")
+    parser.add_argument("--transport", choices=["streamable-http", "sse"], default="streamable-http")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind to")
+    parser.add_argument("--port", type=int, default=8765, help="Port to bind to")
+    args = parser.parse_args()
+
+    params = arxiv_server_params(os.path.abspath(args.storage_path))
+    # The stdio child is started once and kept alive across client connections
+    proxy = FastMCP.as_proxy(
+        StdioTransport(command=params.command, args=params.args),
+        name="arxiv-mcp-server"
+    )
+    path = "/sse" if args.transport == "sse" else "/mcp"
+    print(f"Serving arxiv MCP server at http://{args.host}:{args.port}{path} ({args.transport})")
+    proxy.run(transport=args.transport, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,98 +1,288 @@
 import os
+import asyncio
+import anyio
 from contextlib import AsyncExitStack
-from typing import Optional
+from typing import Optional, List
 
 from fastmcp.utilities.logging import get_logger
-from mcp import ClientSession
+from mcp import ClientSession, McpError, types
 from mcp.client.stdio import stdio_client
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamablehttp_client
+from google.adk.tools.base_toolset import BaseToolset
+from google.adk.tools.mcp_tool.mcp_tool import MCPTool
 from google.adk.tools.mcp_tool.mcp_toolset import (
-    MCPToolset, 
     StdioConnectionParams,
-    StdioServerParameters
+    StdioServerParameters,
+    SseConnectionParams,
+    StreamableHTTPConnectionParams
 )
+from google.adk.tools.mcp_tool.mcp_session_manager import MCPSessionManager
+
+from personal_agent.metrics import inc
+from personal_agent.scheduler import slot, MCP
 
 logger = get_logger(__name__)
 
-def print_stdout(proc):
-    for line in iter(proc.stdout.readline, ''):
-        if not line:
-            break
-        print("[SERVER STDOUT]", line, end='')
+TRANSPORTS = ("stdio", "sse", "streamable-http")
+
+# Paper cache shared by the server, the local manifest and cached analyses
+DEFAULT_STORAGE_PATH = "./arxiv-mcp-server/papers"
+
+
+def arxiv_server_params(storage_path: str) -> StdioServerParameters:
+    """How to start the arxiv MCP server as a child process"""
+    return StdioServerParameters(
+        command='uv',
+        args=[
+            'tool',
+            'run',
+            'arxiv-mcp-server',
+            '--storage-path', storage_path
+        ],
+    )
+
+
+class ArxivClientSession(ClientSession):
+    """ClientSession that schedules its requests and cancels abandoned ones on the server.
+
+    Every request, from the direct client and from agent tool calls alike,
+    goes through send_request, so this is the one place that waits for an
+    MCP slot from the scheduler and sends `notifications/cancelled` when
+    the awaiting task is cancelled. Requests still waiting when the
+    connection is lost fail with anyio.ClosedResourceError instead of
+    hanging.
+    """
+
+    async def send_request(self, request, result_type, *args, **kwargs):
+        async with slot(MCP):
+            # BaseSession.send_request takes its id from here before its first await
+            request_id = self._request_id
+            try:
+                return await super().send_request(request, result_type, *args, **kwargs)
+            except asyncio.CancelledError:
+                await self._cancel_request(request_id, request.root)
+                raise
+            except McpError as e:
+                # What MCPTool and the client reconnect and retry on
+                if e.error.code == types.CONNECTION_CLOSED:
+                    raise anyio.ClosedResourceError("MCP connection closed") from e
+                raise
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        # BaseSession fails waiting requests only when the server closes the
+        # stream; a dropped transport cancels the receive loop instead, and
+        # they would wait forever. Nothing here may await: the transport's
+        # cancelled task group may be what is closing us.
+        for request_id, stream in list(self._response_streams.items()):
+            error = types.ErrorData(code=types.CONNECTION_CLOSED, message="Connection closed")
+            try:
+                stream.send_nowait(types.JSONRPCError(jsonrpc="2.0", id=request_id, error=error))
+            except (anyio.WouldBlock, anyio.BrokenResourceError, anyio.ClosedResourceError):
+                pass
+            stream.close()
+        self._response_streams.clear()
+        return await super().__aexit__(exc_type, exc_val, exc_tb)
+
+    async def _cancel_request(self, request_id: int, request):
+        params = getattr(request, "params", None)
+        name = getattr(params, "name", None) or request.method
+        inc("mcp_calls_cancelled_total", tool=name)
+        try:
+            await asyncio.wait_for(
+                self.send_notification(types.ClientNotification(
+                    types.CancelledNotification(
+                        method="notifications/cancelled",
+                        params=types.CancelledNotificationParams(
+                            requestId=request_id,
+                            reason="Client cancelled the request"
+                        )
+                    )
+                )),
+                timeout=1
+            )
+        except Exception as e:
+            logger.warning(f"Failed to cancel '{name}' request {request_id}: {e}")
+
+
+class SharedSessionManager(MCPSessionManager):
+    """Gives MCP tools the server manager's session instead of a server of their own"""
+
+    def __init__(self, server_manager: "ArxivMCPServerManager"):
+        super().__init__(connection_params=server_manager.connection_params())
+        self.server_manager = server_manager
+        self._session: Optional[ClientSession] = None
+
+    async def create_session(self) -> ClientSession:
+        self._session = await self.server_manager.get_session()
+        return self._session
+
+    async def close(self):
+        # MCPTool calls this after a closed-resource error, then create_session()
+        # and retries: drop the dead connection so that reconnects
+        await self.server_manager.reset_session(self._session)
+
+
+class ArxivToolset(BaseToolset):
+    """The arxiv server's tools for an agent, called over the server manager's session.
+
+    Agent tool calls share get_session() with the direct client calls: one
+    server connection, and one place to schedule, cancel, record or replay
+    its traffic.
+    """
+
+    def __init__(self, server_manager: "ArxivMCPServerManager", *, tool_filter: Optional[List[str]] = None):
+        super().__init__(tool_filter=tool_filter)
+        self.session_manager = SharedSessionManager(server_manager)
+
+    async def get_tools(self, readonly_context=None) -> List[MCPTool]:
+        session = await self.session_manager.create_session()
+        result = await session.list_tools()
+        tools = [
+            MCPTool(mcp_tool=tool, mcp_session_manager=self.session_manager)
+            for tool in result.tools
+        ]
+        return [tool for tool in tools if self._is_tool_selected(tool, readonly_context)]
+
+    async def close(self):
+        # The server manager owns the session and closes it on shutdown
+        pass
 
 
 class ArxivMCPServerManager:    
+    """Owns the MCP session to the arxiv server.
+
+    By default the server runs as a stdio child of this process. With
+    `server_url` (or ARXIV_MCP_SERVER_URL) it instead connects to a shared,
+    long-lived server (see `python -m personal_agent.mcp.server`) over SSE or
+    streamable HTTP, so several API workers use one warm server and one
+    paper cache. Either way the process holds a single session that every
+    client and toolset call is multiplexed over.
+    """
+
     def __init__(
         self, 
         *, 
-        storage_path: Optional[str] = None
+        storage_path: Optional[str] = None,
+        server_url: Optional[str] = None,
+        transport: Optional[str] = None,
+        traffic=None
     ):
-        self.storage_path = storage_path or os.path.expanduser("~/.arxiv-mcp-server/papers")
+        self.storage_path = storage_path or DEFAULT_STORAGE_PATH
+        self.server_url = server_url or os.getenv("ARXIV_MCP_SERVER_URL")
+        self.transport = transport or os.getenv("ARXIV_MCP_TRANSPORT") or self._default_transport()
+        if self.transport not in TRANSPORTS:
+            raise ValueError(f"Unknown MCP transport: {self.transport}")
+        if self.transport != "stdio" and not self.server_url:
+            raise ValueError(f"The {self.transport} transport needs a server URL")
+        # Optional record/replay harness (personal_agent.replay) for the MCP traffic
+        self.traffic = traffic
+        self._session_lock = asyncio.Lock()
         self.client = None
         self.read_stream = None
         self.write_stream = None
         self.session: ClientSession = None
+        self.server_info = None
         self.exit_stack = AsyncExitStack()
+        self._connection_task = None
+        self._closing = None
 
-    def get_toolset(self):
-        toolset = MCPToolset(connection_params=StdioConnectionParams(
-            server_params=StdioServerParameters(
-                command='uv',
-                args=[
-                    'tool',
-                    'run',
-                    'arxiv-mcp-server',
-                    '--storage-path', self.storage_path
-                ],
-            )
-        ))
-
-        self.toolset = toolset
+    def _default_transport(self) -> str:
+        if not self.server_url:
+            return "stdio"
+        return "sse" if self.server_url.rstrip("/").endswith("/sse") else "streamable-http"
 
-        return self.toolset
+    def connection_params(self):
+        if self.transport == "sse":
+            return SseConnectionParams(url=self.server_url)
+        if self.transport == "streamable-http":
+            return StreamableHTTPConnectionParams(url=self.server_url)
+        return StdioConnectionParams(server_params=arxiv_server_params(self.storage_path))
 
-    async def get_session(self):
-        if self.session:
-            return
-        
-        stdio_params = StdioServerParameters(
-            command='uv',
-            args=[
-                'tool',
-                'run',
-                'arxiv-mcp-server',
-                '--storage-path', self.storage_path
-            ],
-        )
+    def _client(self):
+        if self.transport == "sse":
+            return sse_client(self.server_url)
+        if self.transport == "streamable-http":
+            return streamablehttp_client(self.server_url)
+        return stdio_client(arxiv_server_params(self.storage_path))
 
-        self.client = stdio_client(stdio_params)
-        self.read_stream, self.write_stream = await self.exit_stack.enter_async_context(self.client)
-        self.session = await self.exit_stack.enter_async_context(
-            ClientSession(self.read_stream, self.write_stream)
-        )
+    def get_toolset(self, tool_filter: Optional[List[str]] = None) -> ArxivToolset:
+        self.toolset = ArxivToolset(self, tool_filter=tool_filter)
+        return self.toolset
 
-        await self.session.initialize()
+    async def get_session(self) -> ClientSession:
+        async with self._session_lock:
+            if self.session is None:
+                ready = asyncio.get_running_loop().create_future()
+                self._closing = asyncio.Event()
+                self._connection_task = asyncio.create_task(self._hold_connection(ready))
+                await ready
+            return self.session
 
-    async def shutdown(self):
-        logger.info("Shutting down ArxivMCPServerManager")
+    async def reset_session(self, session: ClientSession):
+        """Close `session` after its connection was lost, so the next get_session() reconnects"""
+        async with self._session_lock:
+            # Someone else already replaced it
+            if session is None or self.session is not session:
+                return
+            logger.warning("MCP connection lost, reconnecting on next use")
+            self._closing.set()
+            await self._connection_task
 
+    async def _hold_connection(self, ready: asyncio.Future):
+        # The transport and session are entered and exited in this one task,
+        # whichever request happened to open the connection first
+        error = None
         try:
-            if self.exit_stack:
+            await self._start_session()
+            ready.set_result(None)
+            await self._closing.wait()
+        except BaseException as e:
+            # A failing transport cancels this task from its task group; the
+            # failure itself comes out of closing the exit stack below
+            error = e
+        finally:
+            try:
                 await self.exit_stack.aclose()
-        except Exception as e:
-            logger.warning(f"Error during shutdown: {e}")
-
-        try:
-            # Use the exit stack to properly close all contexts
-            # This will handle the session and client cleanup
-            await self.exit_stack.aclose()
-            
-            # Reset all references
+            except BaseException as e:
+                error = e
+            if error is not None:
+                logger.warning(f"MCP connection failed: {error!r}")
+            self.exit_stack = AsyncExitStack()
             self.session = None
             self.read_stream = None
             self.write_stream = None
             self.client = None
-            
-        except Exception as e:
-            logger.warning(f"Error during shutdown: {e}")
+            if not ready.done():
+                ready.set_exception(ConnectionError(f"Could not connect to the arxiv MCP server: {error!r}"))
+
+    async def _start_session(self):
+        if self.transport != "stdio":
+            logger.info(f"Connecting to shared arxiv MCP server at {self.server_url} ({self.transport})")
+
+        self.client = self._client()
+        if self.traffic:
+            self.client = self.traffic.mcp_transport(self.client)
+        # streamable HTTP also yields a session id getter
+        streams = await self.exit_stack.enter_async_context(self.client)
+        self.read_stream, self.write_stream = streams[:2]
+        self.session = await self.exit_stack.enter_async_context(
+            ArxivClientSession(self.read_stream, self.write_stream)
+        )
+
+        result = await self.session.initialize()
+        self.server_info = result.serverInfo
+
+    async def shutdown(self):
+        logger.info("Shutting down ArxivMCPServerManager")
+
+        if self._connection_task is not None:
+            # The connection task closes the session and transport on its way out
+            self._closing.set()
+            try:
+                await self._connection_task
+            except Exception as e:
+                logger.warning(f"Error during shutdown: {e}")
+            self._connection_task = None
         
         logger.info("ArxivMCPServerManager shutdown complete")
\ No newline at end of file
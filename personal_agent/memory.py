@@ -0,0 +1,247 @@
+import os
+import re
+import math
+import time
+import zlib
+import array
+import sqlite3
+import asyncio
+import threading
+from datetime import datetime
+
+from google.adk.memory.base_memory_service import BaseMemoryService, SearchMemoryResponse
+from google.adk.memory.memory_entry import MemoryEntry
+from google.adk.sessions import Session
+from google.genai import types
+
+from personal_agent.agents.tool_budget import tool_result_text
+
+VECTOR_DIM = 1024
+WORD_RE = re.compile(r"\w+")
+
+# Tool results that would only feed memory back into itself
+SKIPPED_TOOLS = {"load_memory"}
+
+
+def words(text: str) -> list:
+    return [w.lower() for w in WORD_RE.findall(text) if len(w) > 1]
+
+
+def hashed_vector(text: str) -> dict:
+    """Sparse, L2-normalized bag of words with feature hashing: {index: weight}"""
+    vector = {}
+    tokens = words(text)
+    for token in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+        h = zlib.crc32(token.encode("utf-8"))
+        index = h % VECTOR_DIM
+        vector[index] = vector.get(index, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {i: v / norm for i, v in vector.items() if v} if norm else {}
+
+
+def pack_vector(vector: dict) -> bytes:
+    indices = array.array("H", vector.keys())
+    values = array.array("f", vector.values())
+    return indices.tobytes() + values.tobytes()
+
+
+def unpack_vector(blob: bytes) -> dict:
+    n = len(blob) // 6
+    indices = array.array("H")
+    values = array.array("f")
+    indices.frombytes(blob[:2 * n])
+    values.frombytes(blob[2 * n:])
+    return dict(zip(indices, values))
+
+
+def event_text(event, max_chars: int) -> str:
+    """Text worth remembering from an event: its messages and tool results"""
+    texts = []
+    for part in event.content.parts:
+        if part.text and not part.thought:
+            texts.append(part.text)
+        elif part.function_response and part.function_response.name not in SKIPPED_TOOLS:
+            response = part.function_response.response or {}
+            # Non-dict results (e.g. MCP CallToolResult) are wrapped as {"result": ...}
+            if list(response) == ["result"]:
+                response = response["result"]
+            texts.append(f"[{part.function_response.name} result] {tool_result_text(response)}")
+    return "\n".join(texts)[:max_chars]
+
+
+class LocalMemoryService(BaseMemoryService):
+    """Long-term memory of past sessions kept in a local SQLite database.
+
+    Every message and tool result is stored once per event with an FTS5 index
+    and a hashed bag-of-words vector. Searches blend keyword and vector
+    similarity and decay older memories; each user keeps at most
+    `max_entries`, oldest dropped first.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_entries: int = 5000,
+        max_chars: int = 2000,
+        half_life_days: float = 30.0,
+        top_k: int = 5,
+        vector_candidates: int = 2000
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.half_life = half_life_days * 24 * 60 * 60
+        self.top_k = top_k
+        self.vector_candidates = vector_candidates
+        # Sessions are append-only, so each ingest only needs the new events:
+        # {(app, user, session): (events ingested, id of the last one)}
+        self._ingested = {}
+
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened on first use so that creating the service touches no files
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            with conn:
+                conn.executescript("""
+                    CREATE TABLE IF NOT EXISTS memories (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        app_name TEXT NOT NULL,
+                        user_id TEXT NOT NULL,
+                        session_id TEXT NOT NULL,
+                        event_id TEXT NOT NULL,
+                        author TEXT,
+                        text TEXT NOT NULL,
+                        timestamp REAL NOT NULL,
+                        vector BLOB NOT NULL,
+                        UNIQUE (app_name, user_id, event_id)
+                    );
+                    CREATE INDEX IF NOT EXISTS memories_by_user
+                        ON memories (app_name, user_id, timestamp);
+                    CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(text);
+                """)
+            self._conn = conn
+        return self._conn
+
+    async def add_session_to_memory(self, session: Session):
+        await asyncio.to_thread(self._add_session, session)
+
+    async def search_memory(
+        self, *, app_name: str, user_id: str, query: str
+    ) -> SearchMemoryResponse:
+        return await asyncio.to_thread(self._search, app_name, user_id, query)
+
+    def _new_events(self, key: tuple, session: Session) -> list:
+        count, last_id = self._ingested.get(key, (0, None))
+        # A session recreated under the same id (e.g. after expiry) starts over;
+        # already stored events are skipped by the event_id constraint
+        if count and (len(session.events) < count or session.events[count - 1].id != last_id):
+            count = 0
+        return session.events[count:]
+
+    def _add_session(self, session: Session):
+        key = (session.app_name, session.user_id, session.id)
+        events = self._new_events(key, session)
+
+        rows = []
+        for event in events:
+            if event.partial or not event.content or not event.content.parts:
+                continue
+            text = event_text(event, self.max_chars)
+            if text.strip():
+                rows.append((event.id, event.author, text, event.timestamp))
+
+        with self._lock, self._connect():
+            for event_id, author, text, timestamp in rows:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO memories "
+                    "(app_name, user_id, session_id, event_id, author, text, timestamp, vector) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (session.app_name, session.user_id, session.id, event_id, author,
+                     text, timestamp, pack_vector(hashed_vector(text)))
+                )
+                if cursor.rowcount:
+                    self._conn.execute(
+                        "INSERT INTO memories_fts (rowid, text) VALUES (?, ?)",
+                        (cursor.lastrowid, text)
+                    )
+            if rows:
+                self._prune(session.app_name, session.user_id)
+
+        if session.events:
+            self._ingested[key] = (len(session.events), session.events[-1].id)
+
+    def _prune(self, app_name: str, user_id: str):
+        stale = [row[0] for row in self._conn.execute(
+            "SELECT id FROM memories WHERE app_name = ? AND user_id = ? "
+            "ORDER BY timestamp DESC LIMIT -1 OFFSET ?",
+            (app_name, user_id, self.max_entries)
+        )]
+        for start in range(0, len(stale), 500):
+            ids = stale[start:start + 500]
+            marks = ",".join("?" * len(ids))
+            self._conn.execute(f"DELETE FROM memories WHERE id IN ({marks})", ids)
+            self._conn.execute(f"DELETE FROM memories_fts WHERE rowid IN ({marks})", ids)
+
+    def _search(self, app_name: str, user_id: str, query: str) -> SearchMemoryResponse:
+        tokens = words(query)
+        if not tokens:
+            return SearchMemoryResponse()
+
+        match = " OR ".join('"{}"'.format(token.replace('"', '""')) for token in set(tokens))
+        query_vector = hashed_vector(query)
+
+        with self._lock:
+            self._connect()
+            keyword_rows = self._conn.execute(
+                "SELECT m.id, m.author, m.text, m.timestamp, m.vector, bm25(memories_fts) "
+                "FROM memories_fts JOIN memories m ON m.id = memories_fts.rowid "
+                "WHERE memories_fts MATCH ? AND m.app_name = ? AND m.user_id = ? "
+                "ORDER BY bm25(memories_fts) LIMIT ?",
+                (match, app_name, user_id, self.top_k * 10)
+            ).fetchall()
+            recent_rows = self._conn.execute(
+                "SELECT id, author, text, timestamp, vector, NULL FROM memories "
+                "WHERE app_name = ? AND user_id = ? ORDER BY timestamp DESC LIMIT ?",
+                (app_name, user_id, self.vector_candidates)
+            ).fetchall()
+
+        now = time.time()
+        scored = {}
+        for row_id, author, text, timestamp, blob, bm25 in keyword_rows + recent_rows:
+            if row_id in scored and bm25 is None:
+                continue
+            vector = unpack_vector(blob)
+            similarity = sum(weight * vector.get(i, 0.0) for i, weight in query_vector.items())
+            # bm25() is negative, more negative is a better match
+            strength = max(-bm25, 0.0) if bm25 is not None else 0.0
+            keyword = strength / (1.0 + strength)
+            if keyword == 0.0 and similarity < 0.2:
+                continue
+
+            decay = 0.5 ** (max(now - timestamp, 0.0) / self.half_life)
+            scored[row_id] = ((0.6 * keyword + 0.4 * similarity) * decay, author, text, timestamp)
+
+        best = sorted(scored.values(), key=lambda entry: entry[0], reverse=True)[:self.top_k]
+        return SearchMemoryResponse(memories=[
+            MemoryEntry(
+                content=types.Content(
+                    role="user" if author == "user" else "model",
+                    parts=[types.Part(text=text)]
+                ),
+                author=author,
+                timestamp=datetime.fromtimestamp(timestamp).isoformat()
+            )
+            for _, author, text, timestamp in best
+        ])
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,92 @@
+import threading
+from typing import Dict, Tuple
+
+
+def _key(name: str, labels: dict) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _escape(value: str) -> str:
+    # Label values may come from clients; the text format needs these escaped
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(name: str, labels: tuple) -> str:
+    if not labels:
+        return name
+    pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return f"{name}{{{pairs}}}"
+
+
+class MetricsRegistry:
+    """Process-local counters and gauges, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.counters: Dict[tuple, float] = {}
+        self.gauges: Dict[tuple, float] = {}
+        self.descriptions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, description: str):
+        self.descriptions[name] = description
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def remove(self, name: str, **labels):
+        with self._lock:
+            self.gauges.pop(_key(name, labels), None)
+
+    def get(self, name: str, **labels) -> float:
+        key = _key(name, labels)
+        return self.counters.get(key, self.gauges.get(key, 0))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                seen = set()
+                for (name, labels), value in sorted(values.items()):
+                    if name not in seen:
+                        seen.add(name)
+                        if name in self.descriptions:
+                            lines.append(f"# HELP {name} {self.descriptions[name]}")
+                        lines.append(f"# TYPE {name} {kind}")
+                    lines.append(f"{_format(name, labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry instance
+metrics = MetricsRegistry()
+
+metrics.describe("sse_client_disconnects_total", "SSE clients that went away before their turn finished")
+metrics.describe("agent_turns_cancelled_total", "Agent turns cancelled after their clients stayed away past the resume grace period")
+metrics.describe("sse_resumes_total", "SSE reconnects resumed from a turn's replay buffer")
+metrics.describe("mcp_calls_cancelled_total", "In-flight MCP requests cancelled on the server")
+metrics.describe("model_calls_cancelled_total", "Model calls abandoned because their turn was cancelled")
+metrics.describe("tool_results_spilled_total", "Oversized tool results stored as artifacts instead of inlined")
+metrics.describe("tool_result_bytes_spilled_total", "Bytes of tool results kept out of the model context")
+metrics.describe("event_loop_lag_seconds", "How late the event loop ran the latest lag sample")
+metrics.describe("event_loop_lag_max_seconds", "Worst event loop lag over the recent sample window")
+metrics.describe("event_loop_stalls_total", "Event loop lag samples over the stall threshold")
+metrics.describe("event_loop_stall_seconds_total", "Total event loop lag of samples over the stall threshold")
+metrics.describe("scheduler_queue_depth", "Model/MCP calls waiting for a scheduler slot")
+metrics.describe("scheduler_slots_in_use", "Model/MCP scheduler slots currently held")
+metrics.describe("scheduler_waits_total", "Model/MCP calls that had to queue for a slot")
+metrics.describe("scheduler_wait_seconds_total", "Total time model/MCP calls spent queued for a slot")
+metrics.describe("scheduler_deadline_exceeded_total", "Queued model/MCP calls dropped because their deadline passed")
+metrics.describe("llm_tokens_total", "Model tokens used, by model and prompt/completion")
+metrics.describe("user_tokens_window", "Tokens each active user (by hashed user id) spent within the budget window")
+metrics.describe("model_downgrades_total", "Model calls served by the budget downgrade model instead of the configured one")
+metrics.describe("turns_throttled_total", "Turns refused with 429 because the user was over their token budget")
+
+# Export convenience functions
+inc = metrics.inc
+set_gauge = metrics.set
+remove_gauge = metrics.remove
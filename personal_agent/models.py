@@ -0,0 +1,255 @@
+import os
+import json
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import AsyncGenerator, Callable, Dict, List, Optional
+
+from pydantic import PrivateAttr
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.models.registry import LLMRegistry
+
+from personal_agent.metrics import inc
+from personal_agent.scheduler import acquire, current_work, MODEL
+from personal_agent.usage import record_usage, usage_ledger
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "gemini-2.0-flash-001"
+
+# Stages are agent names, plus the deep-paper-analysis tool call
+ROOT_STAGE = "root_agent"
+ARXIV_STAGE = "arxiv_research_agent"
+DEEP_ANALYSIS_STAGE = "deep-paper-analysis"
+
+
+class FallbackLlm(BaseLlm):
+    """Calls the primary model and falls back to the next one when it is slow or failing.
+
+    `timeouts` bounds how long each model may take to produce its first
+    response. With `hedge_after` set, the next model is started in parallel
+    once the current one has been silent that long, and whichever answers
+    first wins. Once a response has been yielded the stream is committed to
+    that model.
+    """
+
+    fallbacks: List[str] = []
+    timeouts: Dict[str, float] = {}
+    hedge_after: Optional[float] = None
+
+    _llms: dict = PrivateAttr(default_factory=dict)
+    _wrap: Optional[Callable[[BaseLlm], BaseLlm]] = PrivateAttr(default=None)
+
+    @property
+    def candidates(self) -> List[str]:
+        return [self.model, *[name for name in self.fallbacks if name != self.model]]
+
+    def wrap_models(self, wrap: Callable[[BaseLlm], BaseLlm]):
+        """Route every candidate model through `wrap`, e.g. to record or replay its traffic"""
+        self._wrap = wrap
+        self._llms.clear()
+
+    def _llm(self, name: str) -> BaseLlm:
+        if name not in self._llms:
+            llm = LLMRegistry.new_llm(name)
+            self._llms[name] = self._wrap(llm) if self._wrap else llm
+        return self._llms[name]
+
+    def _start(self, name: str, llm_request: LlmRequest, stream: bool):
+        # Each attempt gets its own request so concurrent hedges don't share
+        # the contents list the model class appends to.
+        request = llm_request.model_copy(
+            update={"model": name, "contents": list(llm_request.contents)}
+        )
+        responses = self._llm(name).generate_content_async(request, stream=stream)
+        task = asyncio.ensure_future(responses.__anext__())
+
+        loop = asyncio.get_running_loop()
+        timeout = self.timeouts.get(name)
+        deadline = loop.time() + timeout if timeout else None
+        return task, (name, responses, deadline)
+
+    @staticmethod
+    async def _discard(task, responses):
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        try:
+            await responses.aclose()
+        except Exception:
+            pass
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        # Wait for a model slot behind higher-priority work (see scheduler.py)
+        release = await acquire(MODEL)
+        try:
+            async with aclosing(self._generate(llm_request, stream)) as responses:
+                async for response in responses:
+                    if not response.partial and response.usage_metadata:
+                        record_usage((response.custom_metadata or {}).get("model", self.model), response.usage_metadata)
+                    if not response.partial:
+                        # The flow runs tools and sub-agents (which need slots of
+                        # their own) before pulling again, so hand the slot back now
+                        release()
+                    yield response
+        finally:
+            release()
+
+    async def _generate(
+        self, llm_request: LlmRequest, stream: bool
+    ) -> AsyncGenerator[LlmResponse, None]:
+        loop = asyncio.get_running_loop()
+        candidates = self.candidates
+        downgrade = usage_ledger.model_for(current_work.get().user_id)
+        if downgrade and downgrade != self.model:
+            # The user is close to their token budget; the configured models stay as fallbacks
+            inc("model_downgrades_total", model=self.model, to=downgrade)
+            candidates = [downgrade, *[name for name in candidates if name != downgrade]]
+        attempts = {}
+        last_error = None
+        next_index = 0
+        last_start = 0.0
+        winner = None
+
+        try:
+            while winner is None:
+                now = loop.time()
+                for task, (name, responses, deadline) in list(attempts.items()):
+                    if deadline is not None and now >= deadline:
+                        del attempts[task]
+                        await self._discard(task, responses)
+                        last_error = asyncio.TimeoutError(f"{name} did not respond in time")
+                        logger.warning(f"Model {name} timed out, falling back")
+
+                if not attempts:
+                    if next_index >= len(candidates):
+                        break
+                    task, attempt = self._start(candidates[next_index], llm_request, stream)
+                    attempts[task] = attempt
+                    next_index += 1
+                    last_start = loop.time()
+
+                can_hedge = self.hedge_after is not None and next_index < len(candidates)
+                wakeups = [deadline for _, _, deadline in attempts.values() if deadline is not None]
+                if can_hedge:
+                    wakeups.append(last_start + self.hedge_after)
+                wait = max(min(wakeups) - loop.time(), 0) if wakeups else None
+
+                done, _ = await asyncio.wait(
+                    attempts.keys(), timeout=wait, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                for task in done:
+                    name, responses, _ = attempts.pop(task)
+                    try:
+                        first = task.result()
+                    except StopAsyncIteration:
+                        winner = (name, responses, None)
+                        break
+                    except Exception as e:
+                        last_error = e
+                        logger.warning(f"Model {name} failed ({e}), falling back")
+                        continue
+                    winner = (name, responses, first)
+                    break
+
+                if winner is None and not done and can_hedge and loop.time() >= last_start + self.hedge_after:
+                    logger.info(f"Hedging slow model call with {candidates[next_index]}")
+                    task, attempt = self._start(candidates[next_index], llm_request, stream)
+                    attempts[task] = attempt
+                    next_index += 1
+                    last_start = loop.time()
+        except asyncio.CancelledError:
+            inc("model_calls_cancelled_total", model=self.model)
+            raise
+        finally:
+            for task, (_, responses, _) in attempts.items():
+                await self._discard(task, responses)
+
+        if winner is None:
+            raise last_error or RuntimeError("No model candidates configured")
+
+        name, responses, first = winner
+        if first is None:
+            return
+        if name != self.model:
+            logger.info(f"Served by fallback model {name} instead of {self.model}")
+        yield self._tag(first, name)
+        async for response in responses:
+            yield self._tag(response, name)
+
+    @staticmethod
+    def _tag(response: LlmResponse, name: str) -> LlmResponse:
+        # Record which candidate actually answered
+        response.custom_metadata = {**(response.custom_metadata or {}), "model": name}
+        return response
+
+
+class ModelConfig:
+    """Per-stage model selection with fallback chains.
+
+    Loaded from a JSON file such as:
+
+        {
+            "default": {"model": "gemini-2.0-flash-001"},
+            "stages": {
+                "deep-paper-analysis": {
+                    "model": "gemini-2.5-pro",
+                    "fallbacks": ["gemini-2.5-flash"],
+                    "hedge_after": 20
+                }
+            },
+            "timeouts": {"gemini-2.5-pro": 90, "gemini-2.0-flash-001": 20}
+        }
+
+    Stages without an entry use "default".
+    """
+
+    def __init__(
+        self,
+        *,
+        default: Optional[dict] = None,
+        stages: Optional[Dict[str, dict]] = None,
+        timeouts: Optional[Dict[str, float]] = None
+    ):
+        self.default = default or {"model": DEFAULT_MODEL}
+        self.stages = stages or {}
+        self.timeouts = timeouts or {}
+
+    @classmethod
+    def from_file(cls, path: str) -> "ModelConfig":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            default=data.get("default"),
+            stages=data.get("stages"),
+            timeouts=data.get("timeouts")
+        )
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, *, default_model: Optional[str] = None) -> "ModelConfig":
+        """Load from `path` or $PERSONAL_AGENT_MODEL_CONFIG, else use one model everywhere"""
+        path = path or os.getenv("PERSONAL_AGENT_MODEL_CONFIG")
+        config = cls.from_file(path) if path else cls()
+        if default_model:
+            config.default = {**config.default, "model": default_model}
+        return config
+
+    def to_dict(self) -> dict:
+        return {"default": self.default, "stages": self.stages, "timeouts": self.timeouts}
+
+    def stage(self, name: str) -> dict:
+        return {**self.default, **self.stages.get(name, {})}
+
+    def model_name(self, stage: str) -> str:
+        return self.stage(stage)["model"]
+
+    def build(self, stage: str) -> FallbackLlm:
+        spec = self.stage(stage)
+        return FallbackLlm(
+            model=spec["model"],
+            fallbacks=spec.get("fallbacks", []),
+            timeouts={**self.timeouts, **spec.get("timeouts", {})},
+            hedge_after=spec.get("hedge_after")
+        )
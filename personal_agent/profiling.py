@@ -0,0 +1,165 @@
+import io
+import sys
+import time
+import pstats
+import asyncio
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+
+
+def frame_stack(frame) -> list:
+    """Function names of a frame and its callers, outermost first"""
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def task_stack(task: asyncio.Task) -> list:
+    """Coroutine frames a task is suspended in, outermost first"""
+    stack = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})")
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "ag_await", None)
+    return stack
+
+
+def collapse(samples: Counter) -> str:
+    """Render stack counts in the collapsed format read by flamegraph.pl and speedscope"""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in samples.most_common())
+
+
+async def sample_stacks(seconds: float, interval: float = 0.005) -> str:
+    """Sample every thread's stack, plus where each asyncio task is waiting.
+
+    Thread samples show what is running, including callbacks that hold the
+    event loop; task samples show which awaits the in-flight requests are
+    suspended on.
+    """
+    samples = Counter()
+    names = {}
+    stop = threading.Event()
+    own_thread = threading.get_ident()
+
+    def sample_threads():
+        while not stop.wait(interval):
+            names.update((thread.ident, thread.name) for thread in threading.enumerate())
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == threading.get_ident():
+                    continue
+                name = "event-loop" if thread_id == own_thread else names.get(thread_id, thread_id)
+                samples[(f"thread:{name}", *frame_stack(frame))] += 1
+
+    sampler = threading.Thread(target=sample_threads, name="profile-sampler", daemon=True)
+    sampler.start()
+    current = asyncio.current_task()
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline:
+            for task in asyncio.all_tasks():
+                if task is not current:
+                    samples[(f"task:{task.get_name()}", *task_stack(task))] += 1
+            await asyncio.sleep(interval * 4)
+    finally:
+        stop.set()
+        await asyncio.to_thread(sampler.join)
+
+    return collapse(samples)
+
+
+async def profile_loop(seconds: float, sort: str = "cumulative", limit: int = 100) -> str:
+    """Deterministically profile everything the event loop runs for `seconds`"""
+    profiler = cProfile.Profile()
+    # The profiler hooks the thread that enables it: the event loop's
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+async def memory_growth(seconds: float, limit: int = 30, frames: int = 10) -> dict:
+    """Allocations that grew between two tracemalloc snapshots `seconds` apart"""
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started:
+            tracemalloc.stop()
+
+    def compare():
+        stats = after.compare_to(before, "traceback")
+        return {
+            "traced_bytes": sum(stat.size for stat in stats),
+            "growth_bytes": sum(stat.size_diff for stat in stats),
+            "top_growth": [
+                {
+                    "size_diff_bytes": stat.size_diff,
+                    "size_bytes": stat.size,
+                    "count_diff": stat.count_diff,
+                    "traceback": stat.traceback.format(),
+                }
+                for stat in stats[:limit]
+            ],
+        }
+
+    return await asyncio.to_thread(compare)
+
+
+async def session_sizes(session_manager) -> dict:
+    """How much the session manager and the ADK session service are holding on to"""
+    service = session_manager.session_service
+    # Copy on the loop so the sizes can be computed in a thread while turns go on
+    sessions = [
+        (app_name, user_id, session_id, list(session.events))
+        for app_name, users in list(service.sessions.items())
+        for user_id, user_sessions in list(users.items())
+        for session_id, session in list(user_sessions.items())
+    ]
+
+    def measure():
+        sizes = [
+            {
+                "app_name": app_name,
+                "user_id": user_id,
+                "session_id": session_id,
+                "events": len(events),
+                "json_bytes": sum(len(event.model_dump_json()) for event in events),
+            }
+            for app_name, user_id, session_id, events in sessions
+        ]
+        sizes.sort(key=lambda size: size["json_bytes"], reverse=True)
+        return sizes
+
+    sizes = await asyncio.to_thread(measure)
+    return {
+        "session_manager": {
+            "users": len(session_manager.user_sessions),
+            "sessions": len(session_manager.sessions),
+            "last_active_entries": len(session_manager.session_last_active),
+        },
+        "session_service": {
+            "sessions": len(sizes),
+            "events": sum(size["events"] for size in sizes),
+            "json_bytes": sum(size["json_bytes"] for size in sizes),
+            "largest": sizes[:10],
+        },
+    }
@@ -1,4 +1,10 @@
+from typing import Literal, Optional
+
 from pydantic import BaseModel
 
 class Query(BaseModel):
-    query: str
\ No newline at end of file
+    query: str
+    # Scheduling class of the turn's model and MCP calls (see scheduler.py)
+    priority: Literal["interactive", "background", "bulk"] = "interactive"
+    # Give up on queued model/MCP calls that could not start within this many seconds
+    deadline_seconds: Optional[float] = None
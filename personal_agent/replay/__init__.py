@@ -0,0 +1,14 @@
+from .cassette import Cassette, CassetteWriter
+from .harness import Traffic, TrafficRecorder, TrafficReplayer
+from .llm import RecordingLlm, ReplayLlm, ReplayMismatch
+
+__all__ = [
+    "Cassette",
+    "CassetteWriter",
+    "Traffic",
+    "TrafficRecorder",
+    "TrafficReplayer",
+    "RecordingLlm",
+    "ReplayLlm",
+    "ReplayMismatch"
+]
@@ -0,0 +1,85 @@
+import os
+import sys
+import glob
+import json
+import asyncio
+import argparse
+import tempfile
+
+
+def cassette_paths(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, "*.jsonl")))
+        else:
+            yield path
+
+
+def print_report(report: dict):
+    print(f"Replayed {report['replays']} cassette runs, {report['turns']} turns "
+          f"in {report['wall_seconds']:.2f}s ({report['turns_per_second']:.2f} turns/s)")
+    for section in ("latency", "first_event"):
+        stats = report[section]
+        print(f"  {section:<12} p50 {stats['p50'] * 1000:9.1f} ms   p95 {stats['p95'] * 1000:9.1f} ms"
+              f"   max {stats['max'] * 1000:9.1f} ms")
+    print(f"  alloc        peak {report['alloc']['peak_bytes'] / 1e6:.1f} MB"
+          f"   retained {report['alloc']['retained_bytes'] / 1e6:.1f} MB")
+    if report["errors"] or report["missing"] or report["fuzzy_matches"] or report["rerouted"]:
+        print(f"  {report['errors']} failed turns, {report['missing']} unrecorded requests, "
+              f"{report['fuzzy_matches']} requests matched by order only, "
+              f"{report['rerouted']} turns routed differently than recorded")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m personal_agent.replay",
+        description="Replay cassettes recorded with `personal_agent --record` and compare against a baseline"
+    )
+    parser.add_argument("cassettes", nargs="+", help="Cassette files or directories of *.jsonl cassettes")
+    parser.add_argument("--concurrency", type=int, default=1, help="Cassettes replayed at the same time")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay every cassette this many times")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="Multiplier for recorded latencies: 1 keeps the original timing, 0 answers at once")
+    parser.add_argument("--no-alloc", action="store_true", help="Skip tracemalloc allocation tracking")
+    parser.add_argument("--baseline", help="Report JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative increase over the baseline before failing")
+    parser.add_argument("--save", metavar="REPORT", help="Write this run's report JSON, e.g. as the new baseline")
+    args = parser.parse_args()
+
+    from .cassette import Cassette
+    from .runner import replay_corpus, compare
+
+    cassettes = [Cassette.load(path) for path in cassette_paths(args.cassettes)]
+    if not cassettes:
+        parser.error("no cassettes found")
+
+    # The agent stack stores memories and artifacts; keep replays out of the real data directory
+    with tempfile.TemporaryDirectory(prefix="replay-data-") as data_path:
+        os.environ["PERSONAL_AGENT_DATA_PATH"] = data_path
+        report = asyncio.run(replay_corpus(
+            cassettes,
+            concurrency=args.concurrency,
+            time_scale=args.time_scale,
+            repeat=args.repeat,
+            track_allocations=not args.no_alloc
+        ))
+    print_report(report)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            rows = compare(report, json.load(f), args.tolerance)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else "ok"
+            print(f"  {row['metric']:<22} {row['baseline']:>14.4f} -> {row['current']:>14.4f}"
+                  f"  x{row['ratio']:.2f}  {flag}")
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from typing import Optional
+
+# 2: local tool results ("tool" entries) and the traffic made inside them
+CASSETTE_VERSION = 2
+
+# ADK assigns random ids to function calls; they would make every request unique
+ADK_ID_RE = re.compile(r"adk-[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+
+
+def request_key(kind: str, name: str, payload) -> str:
+    """Stable key of a model or MCP request, independent of generated ids"""
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    text = ADK_ID_RE.sub("adk-id", text)
+    return hashlib.sha256(f"{kind}\0{name}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+# (call id, start time) of the local tool call being recorded, if any
+current_tool_call: ContextVar[Optional[tuple]] = ContextVar("current_tool_call", default=None)
+
+
+def tag_tool_call(entry: dict, call: Optional[tuple]) -> dict:
+    """Mark traffic made inside a recorded tool call, which replay serves as a whole"""
+    if call is not None:
+        entry["tool_call"] = call[0]
+    return entry
+
+
+class CassetteWriter:
+    """Appends recorded traffic to a JSONL cassette as it happens"""
+
+    def __init__(self, path: str, meta: Optional[dict] = None):
+        self.path = path
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = open(path, "w", encoding="utf-8")
+        self.write({"kind": "meta", "version": CASSETTE_VERSION, "created": time.time(), **(meta or {})})
+
+    def offset(self) -> float:
+        return time.monotonic() - self.started
+
+    def write(self, entry: dict):
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class Cassette:
+    """Recorded traffic of one session, loaded for replay.
+
+    Model, MCP and local tool entries are served by request key; when a
+    request was not recorded verbatim (e.g. it embeds a timestamp), the next
+    unused entry of the same model, MCP method or tool is served in
+    recording order instead.
+    """
+
+    def __init__(self, path: str, entries: list):
+        self.path = path
+        self.meta = next((e for e in entries if e["kind"] == "meta"), {})
+        self.turns = [e for e in entries if e["kind"] == "turn"]
+        self.entries = entries
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(path, [json.loads(line) for line in f if line.strip()])
+
+    def player(self) -> "CassettePlayer":
+        return CassettePlayer(self)
+
+
+class CassettePlayer:
+    """Hands out a cassette's recorded responses, each one at most once"""
+
+    def __init__(self, cassette: Cassette):
+        self.by_key = defaultdict(deque)
+        self.by_name = defaultdict(deque)
+        self.used = set()
+        # Served by recording order instead of an exact request match
+        self.fuzzy = 0
+        # Requests nothing was recorded for
+        self.missing = 0
+        # Tool calls whose results were recorded are not run on replay, so
+        # neither is the model and MCP traffic they made
+        replayed_calls = {entry["call_id"] for entry in cassette.entries if entry["kind"] == "tool"}
+        for index, entry in enumerate(cassette.entries):
+            if entry["kind"] in ("llm", "mcp", "tool") and entry.get("tool_call") not in replayed_calls:
+                self.by_key[entry["key"]].append(index)
+                self.by_name[(entry["kind"], entry["name"])].append(index)
+        self.entries = cassette.entries
+
+    def _pop(self, queue: deque) -> Optional[dict]:
+        while queue:
+            index = queue.popleft()
+            if index not in self.used:
+                self.used.add(index)
+                return self.entries[index]
+        return None
+
+    def take(self, kind: str, name: str, key: str) -> Optional[dict]:
+        entry = self._pop(self.by_key[key])
+        if entry is None:
+            entry = self._pop(self.by_name[(kind, name)])
+            if entry is None:
+                self.missing += 1
+                return None
+            self.fuzzy += 1
+        return entry
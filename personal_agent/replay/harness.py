@@ -0,0 +1,153 @@
+import time
+import uuid
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from pydantic_core import to_jsonable_python
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.models import BaseLlm
+from google.adk.tools.mcp_tool.mcp_tool import MCPTool
+
+from personal_agent.models import FallbackLlm
+from .cassette import CassetteWriter, Cassette, request_key, current_tool_call
+from .llm import RecordingLlm, ReplayLlm
+from .mcp import recording_transport, replay_transport
+
+
+class Traffic(ABC):
+    """Where the record/replay harness hooks into models and the MCP session.
+
+    FallbackLlm chains are instrumented per candidate model, so fallbacks,
+    timeouts and hedging run on replay exactly as they do live. Local
+    function tools (everything but MCP tools, whose traffic is recorded on
+    the wire) answer from local state: the paper manifest, stored analyses
+    and long-term memory. Their results are recorded and replayed whole, so
+    a replay does not depend on what was on disk when it was recorded.
+    """
+
+    @abstractmethod
+    def wrap_llm(self, llm: BaseLlm) -> BaseLlm:
+        """The model to call instead of `llm`"""
+
+    @abstractmethod
+    def mcp_transport(self, transport):
+        """The MCP client transport to use instead of `transport`"""
+
+    def record_turn(self, user_id: str, session_id: str, query: str, agent_name: str):
+        pass
+
+    def instrument_llm(self, llm: BaseLlm) -> BaseLlm:
+        if isinstance(llm, FallbackLlm):
+            llm.wrap_models(self.wrap_llm)
+            return llm
+        if isinstance(llm, (RecordingLlm, ReplayLlm)):
+            return llm
+        return self.wrap_llm(llm)
+
+    def before_tool(self, tool, args, tool_context):
+        return None
+
+    def after_tool(self, tool, args, tool_context, tool_response):
+        return None
+
+    def instrument_agent(self, agent: BaseAgent):
+        if isinstance(agent, LlmAgent):
+            agent.model = self.instrument_llm(agent.canonical_model)
+            # First, so the raw tool result is seen before e.g. the tool budget spills it
+            if self.before_tool not in agent.canonical_before_tool_callbacks:
+                agent.before_tool_callback = [self.before_tool, *agent.canonical_before_tool_callbacks]
+            if self.after_tool not in agent.canonical_after_tool_callbacks:
+                agent.after_tool_callback = [self.after_tool, *agent.canonical_after_tool_callbacks]
+        for sub_agent in agent.sub_agents:
+            self.instrument_agent(sub_agent)
+
+
+def is_local_tool(tool) -> bool:
+    return not isinstance(tool, MCPTool)
+
+
+def tool_response_payload(tool_response) -> dict:
+    """A tool result as the JSON the model sees in its function response"""
+    if not isinstance(tool_response, dict):
+        tool_response = {"result": tool_response}
+    return to_jsonable_python(tool_response, exclude_none=True, fallback=str)
+
+
+class TrafficRecorder(Traffic):
+    """Records model responses, MCP traffic and user turns of a live run to a cassette"""
+
+    def __init__(self, path: str, meta: Optional[dict] = None):
+        self.writer = CassetteWriter(path, meta)
+
+    def wrap_llm(self, llm: BaseLlm) -> BaseLlm:
+        return RecordingLlm(llm, self.writer)
+
+    def mcp_transport(self, transport):
+        return recording_transport(transport, self.writer)
+
+    def before_tool(self, tool, args, tool_context):
+        if is_local_tool(tool):
+            current_tool_call.set((uuid.uuid4().hex, time.monotonic()))
+        return None
+
+    def after_tool(self, tool, args, tool_context, tool_response):
+        call = current_tool_call.get()
+        if call is None or not is_local_tool(tool):
+            return None
+        current_tool_call.set(None)
+        call_id, started = call
+        self.writer.write({
+            "kind": "tool",
+            "name": tool.name,
+            "key": request_key("tool", tool.name, args),
+            "call_id": call_id,
+            "at": self.writer.offset(),
+            "latency": time.monotonic() - started,
+            "response": tool_response_payload(tool_response),
+        })
+        return None
+
+    def record_turn(self, user_id: str, session_id: str, query: str, agent_name: str):
+        self.writer.write({
+            "kind": "turn",
+            "at": self.writer.offset(),
+            "user_id": user_id,
+            "session_id": session_id,
+            "query": query,
+            "agent": agent_name,
+        })
+
+    def close(self):
+        self.writer.close()
+
+
+class TrafficReplayer(Traffic):
+    """Serves a cassette's recorded traffic instead of calling models or starting the MCP server.
+
+    `time_scale` stretches recorded latencies: 1.0 is the original timing,
+    0.1 is ten times faster and 0 answers immediately.
+    """
+
+    def __init__(self, cassette: Cassette, time_scale: float = 1.0):
+        self.cassette = cassette
+        self.player = cassette.player()
+        self.time_scale = time_scale
+
+    def wrap_llm(self, llm: BaseLlm) -> BaseLlm:
+        return ReplayLlm(llm.model, self.player, self.time_scale)
+
+    async def before_tool(self, tool, args, tool_context):
+        if not is_local_tool(tool):
+            return None
+        entry = self.player.take("tool", tool.name, request_key("tool", tool.name, args))
+        if entry is None:
+            # Not recorded (e.g. an older cassette): run the tool on the replay's own state
+            return None
+        if self.time_scale > 0:
+            await asyncio.sleep(entry["latency"] * self.time_scale)
+        return entry["response"]
+
+    def mcp_transport(self, transport):
+        # The real transport is never entered, so no server process is started
+        return replay_transport(self.player, self.time_scale)
@@ -0,0 +1,103 @@
+import asyncio
+from typing import AsyncGenerator
+
+from pydantic import PrivateAttr
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+
+from .cassette import CassetteWriter, CassettePlayer, request_key, tag_tool_call, current_tool_call
+
+
+class ReplayMismatch(RuntimeError):
+    """A request the cassette has no recorded response for"""
+
+
+class RecordedError(RuntimeError):
+    """An error the recorded model or server raised, raised again on replay"""
+
+
+def llm_request_payload(llm_request: LlmRequest) -> dict:
+    return {
+        "contents": [content.model_dump(mode="json", exclude_none=True) for content in llm_request.contents],
+        "config": llm_request.config.model_dump(mode="json", exclude_none=True) if llm_request.config else None,
+    }
+
+
+class RecordingLlm(BaseLlm):
+    """Passes calls through to a model and writes each response stream to a cassette"""
+
+    _inner: BaseLlm = PrivateAttr()
+    _writer: CassetteWriter = PrivateAttr()
+
+    def __init__(self, inner: BaseLlm, writer: CassetteWriter):
+        super().__init__(model=inner.model)
+        self._inner = inner
+        self._writer = writer
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        loop = asyncio.get_running_loop()
+        entry = tag_tool_call({
+            "kind": "llm",
+            "name": self.model,
+            "key": request_key("llm", self.model, llm_request_payload(llm_request)),
+            "at": self._writer.offset(),
+            "stream": stream,
+            "chunks": [],
+        }, current_tool_call.get())
+        last = loop.time()
+        try:
+            async for response in self._inner.generate_content_async(llm_request, stream=stream):
+                now = loop.time()
+                entry["chunks"].append({
+                    "delay": now - last,
+                    "response": response.model_dump(mode="json", exclude_none=True),
+                })
+                last = now
+                yield response
+        except (asyncio.CancelledError, GeneratorExit):
+            # The caller gave up on the stream, e.g. a hedge that lost
+            entry["cancelled_after"] = loop.time() - last
+            raise
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+            entry["error_after"] = loop.time() - last
+            raise
+        finally:
+            self._writer.write(entry)
+
+
+class ReplayLlm(BaseLlm):
+    """Serves recorded response streams with their recorded timing, scaled by `time_scale`"""
+
+    _player: CassettePlayer = PrivateAttr()
+    _time_scale: float = PrivateAttr()
+
+    def __init__(self, model: str, player: CassettePlayer, time_scale: float = 1.0):
+        super().__init__(model=model)
+        self._player = player
+        self._time_scale = time_scale
+
+    async def _wait(self, seconds: float):
+        if self._time_scale > 0 and seconds > 0:
+            await asyncio.sleep(seconds * self._time_scale)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        key = request_key("llm", self.model, llm_request_payload(llm_request))
+        entry = self._player.take("llm", self.model, key)
+        if entry is None:
+            raise ReplayMismatch(f"No recorded response left for model {self.model}")
+
+        for chunk in entry["chunks"]:
+            await self._wait(chunk["delay"])
+            yield LlmResponse.model_validate(chunk["response"])
+
+        if "error" in entry:
+            await self._wait(entry["error_after"])
+            raise RecordedError(entry["error"])
+        if "cancelled_after" in entry:
+            # The recorded call never finished (e.g. it lost a hedge); keep it
+            # pending until the caller gives up on it again
+            await asyncio.Event().wait()
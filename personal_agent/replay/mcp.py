@@ -0,0 +1,132 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import anyio
+from mcp import types
+from mcp.shared.message import SessionMessage
+
+from .cassette import CassetteWriter, CassettePlayer, request_key, tag_tool_call, current_tool_call
+
+
+def mcp_request_payload(request: types.JSONRPCRequest) -> dict:
+    # _meta carries per-call progress tokens, not part of what was asked
+    return {k: v for k, v in (request.params or {}).items() if k != "_meta"}
+
+
+class _StreamProxy:
+    def __init__(self, inner):
+        self._inner = inner
+
+    async def __aenter__(self):
+        await self._inner.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._inner.__aexit__(*exc_info)
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+
+class _RecordingWriteStream(_StreamProxy):
+    def __init__(self, inner, pending: dict):
+        super().__init__(inner)
+        self._pending = pending
+
+    async def send(self, message: SessionMessage):
+        root = message.message.root
+        if isinstance(root, types.JSONRPCRequest):
+            # Sent from the caller's task; the response is read in the session's
+            # (the connection's lifecycle is not part of any one tool call)
+            call = current_tool_call.get() if root.method != "initialize" else None
+            self._pending[root.id] = (root, asyncio.get_running_loop().time(), call)
+        await self._inner.send(message)
+
+
+class _RecordingReadStream(_StreamProxy):
+    def __init__(self, inner, pending: dict, writer: CassetteWriter):
+        super().__init__(inner)
+        self._pending = pending
+        self._writer = writer
+
+    def __aiter__(self):
+        return self._records()
+
+    async def _records(self):
+        async for message in self._inner:
+            root = getattr(getattr(message, "message", None), "root", None)
+            if isinstance(root, (types.JSONRPCResponse, types.JSONRPCError)) and root.id in self._pending:
+                request, started, call = self._pending.pop(root.id)
+                entry = tag_tool_call({
+                    "kind": "mcp",
+                    "name": request.method,
+                    "key": request_key("mcp", request.method, mcp_request_payload(request)),
+                    "at": self._writer.offset(),
+                    "latency": asyncio.get_running_loop().time() - started,
+                }, call)
+                if isinstance(root, types.JSONRPCResponse):
+                    entry["result"] = root.result
+                else:
+                    entry["error"] = root.error.model_dump(mode="json", exclude_none=True)
+                self._writer.write(entry)
+            yield message
+
+
+@asynccontextmanager
+async def recording_transport(transport, writer: CassetteWriter):
+    """Wrap an MCP client transport so every request and its response are recorded"""
+    async with transport as streams:
+        read_stream, write_stream = streams[:2]
+        pending = {}
+        yield (
+            _RecordingReadStream(read_stream, pending, writer),
+            _RecordingWriteStream(write_stream, pending),
+        )
+
+
+@asynccontextmanager
+async def replay_transport(player: CassettePlayer, time_scale: float = 1.0):
+    """An in-process MCP transport that answers requests from a cassette"""
+    to_client, client_read = anyio.create_memory_object_stream(1000)
+    client_write, from_client = anyio.create_memory_object_stream(1000)
+    replies = {}
+
+    async def reply(request: types.JSONRPCRequest):
+        entry = player.take("mcp", request.method, request_key("mcp", request.method, mcp_request_payload(request)))
+        if entry is None:
+            response = types.JSONRPCError(
+                jsonrpc="2.0",
+                id=request.id,
+                error=types.ErrorData(code=types.INTERNAL_ERROR, message=f"No recorded response for {request.method}")
+            )
+        else:
+            if time_scale > 0:
+                await asyncio.sleep(entry["latency"] * time_scale)
+            if "result" in entry:
+                response = types.JSONRPCResponse(jsonrpc="2.0", id=request.id, result=entry["result"])
+            else:
+                response = types.JSONRPCError(jsonrpc="2.0", id=request.id, error=types.ErrorData(**entry["error"]))
+        await to_client.send(SessionMessage(message=types.JSONRPCMessage(response)))
+
+    async def serve():
+        async for message in from_client:
+            root = message.message.root
+            if isinstance(root, types.JSONRPCRequest):
+                task = asyncio.create_task(reply(root))
+                replies[root.id] = task
+                task.add_done_callback(lambda _, request_id=root.id: replies.pop(request_id, None))
+            elif isinstance(root, types.JSONRPCNotification) and root.method == "notifications/cancelled":
+                task = replies.get((root.params or {}).get("requestId"))
+                if task:
+                    task.cancel()
+
+    server = asyncio.create_task(serve())
+    try:
+        yield client_read, client_write
+    finally:
+        server.cancel()
+        for task in list(replies.values()):
+            task.cancel()
+        await asyncio.gather(server, *replies.values(), return_exceptions=True)
+        await to_client.aclose()
+        await from_client.aclose()
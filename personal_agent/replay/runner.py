@@ -0,0 +1,219 @@
+import os
+import time
+import asyncio
+import tempfile
+import tracemalloc
+from typing import List
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai.types import Content, Part
+
+from personal_agent.agents import ArxivResearchAgent
+from personal_agent.agents.root import create_root_agent
+from personal_agent.artifacts import LocalArtifactService
+from personal_agent.memory import LocalMemoryService
+from personal_agent.models import ModelConfig, ROOT_STAGE
+from personal_agent.prerouter import PreRouter
+from personal_agent.scheduler import work_context
+from personal_agent.usage import track_turn
+from .cassette import Cassette
+from .harness import TrafficReplayer
+
+APP_NAME = "personal_agent"
+
+# (section, statistic) pairs compared against a baseline
+COMPARED = [
+    ("latency", "p50"),
+    ("latency", "p95"),
+    ("first_event", "p50"),
+    ("alloc", "peak_bytes"),
+]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "p50": percentile(values, 0.5),
+        "p95": percentile(values, 0.95),
+        "max": max(values, default=0.0),
+        "mean": sum(values) / len(values) if values else 0.0,
+    }
+
+
+async def replay_cassette(cassette: Cassette, *, time_scale: float, workdir: str) -> dict:
+    """Replay a cassette's turns, in order, through a fresh agent stack.
+
+    Turns take the server's path below HTTP: the pre-router (when the
+    recording used it), the scheduler and token accounting under the
+    turn's user and session, the runner, the agents, models and MCP
+    session. SSE framing and resumable turn buffers (process_response,
+    TurnStream) are not replayed, so their cost is not in the numbers.
+    """
+    traffic = TrafficReplayer(cassette, time_scale)
+    model_config = ModelConfig(**cassette.meta.get("model_config", {}))
+    arxiv_agent = ArxivResearchAgent(
+        storage_path=os.path.join(workdir, "papers"),
+        model_config=model_config,
+        traffic=traffic
+    )
+    arxiv_agent.start()
+    root_agent = create_root_agent(model=model_config.build(ROOT_STAGE), sub_agents=[arxiv_agent.agent])
+
+    session_service = InMemorySessionService()
+    memory_service = LocalMemoryService(os.path.join(workdir, "memory.sqlite3"))
+    artifact_service = LocalArtifactService(os.path.join(workdir, "artifacts"))
+    runners = {}
+    for agent in (root_agent, arxiv_agent.agent):
+        traffic.instrument_agent(agent)
+        runners[agent.name] = Runner(
+            app_name=APP_NAME,
+            agent=agent,
+            session_service=session_service,
+            artifact_service=artifact_service,
+            memory_service=memory_service,
+        )
+
+    pre_router = None
+    if cassette.meta.get("prerouter", False):
+        pre_router = PreRouter()
+        pre_router.add_runner(arxiv_agent.agent.name, runners[arxiv_agent.agent.name])
+
+    def run_turn(query: str, user_id: str, session_id: str):
+        # Same routing as the server's run_query
+        content = Content(role="user", parts=[Part(text=query)])
+        root_run = runners[root_agent.name].run_async
+        if pre_router is None:
+            return None, root_run(new_message=content, user_id=user_id, session_id=session_id)
+        decision = pre_router.route(query)
+        if decision.runner:
+            return decision.agent_name, decision.runner.run_async(
+                new_message=content, user_id=user_id, session_id=session_id
+            )
+        return decision.agent_name, pre_router.timed_root_run(
+            root_run(new_message=content, user_id=user_id, session_id=session_id)
+        )
+
+    turns = []
+    errors = 0
+    # Turns the current pre-router sends elsewhere than at recording time
+    rerouted = 0
+    try:
+        for turn in cassette.turns:
+            user_id, session_id = turn["user_id"], turn["session_id"]
+            session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+            if session is None:
+                await session_service.create_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+
+            started = time.perf_counter()
+            first_event = None
+            try:
+                with work_context(user_id=user_id, session_id=session_id), track_turn():
+                    agent_name, events = run_turn(turn["query"], user_id, session_id)
+                    if agent_name is not None and agent_name != turn["agent"]:
+                        rerouted += 1
+                    async for event in events:
+                        if first_event is None and event.content and event.content.parts:
+                            first_event = time.perf_counter() - started
+            except Exception:
+                errors += 1
+
+            elapsed = time.perf_counter() - started
+            turns.append({"latency": elapsed, "first_event": first_event if first_event is not None else elapsed})
+
+            # Same as the server: finished turns go into long-term memory
+            session = await session_service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+            await memory_service.add_session_to_memory(session)
+    finally:
+        await arxiv_agent.cleanup()
+        memory_service.close()
+
+    return {
+        "cassette": cassette.path,
+        "turns": turns,
+        "errors": errors,
+        "rerouted": rerouted,
+        "fuzzy_matches": traffic.player.fuzzy,
+        "missing": traffic.player.missing,
+    }
+
+
+async def replay_corpus(
+    cassettes: List[Cassette],
+    *,
+    concurrency: int = 1,
+    time_scale: float = 1.0,
+    repeat: int = 1,
+    track_allocations: bool = True
+) -> dict:
+    """Replay every cassette `repeat` times, `concurrency` at a time, and summarize.
+
+    tracemalloc slows everything down several times over, so allocations are
+    measured in a second pass rather than alongside the latencies.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def replay(cassette: Cassette):
+        async with semaphore:
+            with tempfile.TemporaryDirectory(prefix="replay-") as workdir:
+                return await replay_cassette(cassette, time_scale=time_scale, workdir=workdir)
+
+    async def replay_all():
+        return await asyncio.gather(*(replay(c) for c in cassettes for _ in range(repeat)))
+
+    started = time.perf_counter()
+    results = await replay_all()
+    wall = time.perf_counter() - started
+
+    alloc = {"peak_bytes": 0, "retained_bytes": 0}
+    if track_allocations:
+        tracemalloc.start()
+        try:
+            await replay_all()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        alloc = {"peak_bytes": peak, "retained_bytes": current}
+
+    turns = [turn for result in results for turn in result["turns"]]
+    return {
+        "cassettes": len(cassettes),
+        "replays": len(results),
+        "concurrency": concurrency,
+        "time_scale": time_scale,
+        "turns": len(turns),
+        "wall_seconds": wall,
+        "turns_per_second": len(turns) / wall if wall else 0.0,
+        "latency": summarize([turn["latency"] for turn in turns]),
+        "first_event": summarize([turn["first_event"] for turn in turns]),
+        "alloc": alloc,
+        "errors": sum(result["errors"] for result in results),
+        "rerouted": sum(result["rerouted"] for result in results),
+        "fuzzy_matches": sum(result["fuzzy_matches"] for result in results),
+        "missing": sum(result["missing"] for result in results),
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[dict]:
+    """Compare a replay report with a stored one; regressions exceed the baseline by `tolerance`"""
+    rows = []
+    for section, stat in COMPARED:
+        current = report.get(section, {}).get(stat)
+        previous = baseline.get(section, {}).get(stat)
+        if current is None or not previous:
+            continue
+        ratio = current / previous
+        rows.append({
+            "metric": f"{section}.{stat}",
+            "baseline": previous,
+            "current": current,
+            "ratio": ratio,
+            "regression": ratio > 1 + tolerance,
+        })
+    return rows
@@ -1,7 +1,88 @@
-from fastapi import APIRouter
+from typing import Optional, List
 
-router = APIRouter()
+from fastapi import APIRouter, Request, HTTPException, Query
 
-@router.get("/arxiv")
-def get_arxiv():
-    return {"message": "Hello, World!"}
\ No newline at end of file
+from personal_agent.mcp.client.arxiv import ArxivMCPClient
+
+# Deterministic arxiv operations served straight from the MCP client,
+# without a model round-trip through the root agent.
+router = APIRouter(prefix="/arxiv")
+
+
+def get_client(request: Request) -> ArxivMCPClient:
+    return request.app.state.arxiv_client
+
+
+async def call_client(coroutine):
+    try:
+        result = await coroutine
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"arxiv MCP server error: {e}")
+
+    if result.get("status") == "error":
+        message = result.get("message") or "arxiv MCP server error"
+        # The server reports missing papers and its own failures the same way
+        status_code = 404 if "not found" in message.lower() else 502
+        raise HTTPException(status_code=status_code, detail=message)
+    return result
+
+
+@router.get("/search")
+async def search_papers(
+    request: Request,
+    q: str,
+    max_results: int = 10,
+    date_from: Optional[str] = None,
+    categories: Optional[List[str]] = Query(None)
+):
+    client = get_client(request)
+    return await call_client(client.search_papers(
+        q,
+        max_results=max_results,
+        date_from=date_from,
+        categories=categories
+    ))
+
+
+@router.get("/papers")
+async def list_papers(
+    request: Request,
+    q: Optional[str] = None,
+    author: Optional[str] = None,
+    offset: int = 0,
+    limit: int = 20
+):
+    client = get_client(request)
+    return await call_client(client.list_papers(
+        query=q,
+        author=author,
+        offset=offset,
+        limit=limit
+    ))
+
+
+# Old-style ids contain a slash (hep-th/9901001), hence the path converter;
+# the routes with a suffix go first so the read route doesn't swallow them
+@router.get("/papers/{paper_id:path}/analysis")
+async def get_stored_analysis(paper_id: str, request: Request):
+    # Only serves stored analyses; generating one needs the agent's model.
+    # Analyses of older paper text or an older prompt don't count.
+    try:
+        entry = await request.app.state.arxiv_agent.stored_analysis(paper_id)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"arxiv MCP server error: {e}")
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"No stored analysis for {paper_id}")
+    return entry
+
+
+@router.post("/papers/{paper_id:path}/download")
+async def download_paper(paper_id: str, request: Request):
+    client = get_client(request)
+    return await call_client(client.download_paper(paper_id))
+
+
+@router.get("/papers/{paper_id:path}")
+async def read_paper(paper_id: str, request: Request):
+    client = get_client(request)
+    return await call_client(client.read_paper(paper_id))
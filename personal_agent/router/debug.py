@@ -0,0 +1,69 @@
+import os
+import pstats
+import asyncio
+import secrets
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Request, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from personal_agent.profiling import sample_stacks, profile_loop, memory_growth, session_sizes
+
+DEBUG_TOKEN_ENV = "PERSONAL_AGENT_DEBUG_TOKEN"
+
+
+def require_debug_token(request: Request):
+    # The debug routes do not exist unless a token is configured
+    token = os.getenv(DEBUG_TOKEN_ENV)
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    given = request.headers.get("x-debug-token", "")
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        given = authorization[len("bearer "):]
+    if not secrets.compare_digest(given.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Invalid debug token")
+
+
+router = APIRouter(prefix="/debug", dependencies=[Depends(require_debug_token)])
+
+# Profilers hook process-wide state; only one runs at a time
+profile_lock = asyncio.Lock()
+
+
+@router.get("/profile")
+async def profile(
+    request: Request,
+    seconds: float = Query(10, gt=0, le=120),
+    mode: Literal["sample", "cprofile", "memory"] = "sample",
+    interval_ms: float = Query(5, ge=1, le=1000),
+    sort: str = "cumulative",
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Profile the live process for `seconds`.
+
+    sample: collapsed stacks of every thread and asyncio task (flamegraph-ready)
+    cprofile: pstats of everything the event loop ran
+    memory: tracemalloc growth plus session manager / session service sizes
+    """
+    if sort not in pstats.Stats.sort_arg_dict_default:
+        raise HTTPException(status_code=400, detail=f"Unknown pstats sort key: {sort}")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    async with profile_lock:
+        if mode == "sample":
+            return PlainTextResponse(await sample_stacks(seconds, interval_ms / 1000))
+
+        if mode == "cprofile":
+            return PlainTextResponse(await profile_loop(seconds, sort=sort, limit=limit))
+
+        session_manager = request.app.state.session_manager
+        before = await session_sizes(session_manager)
+        growth = await memory_growth(seconds, limit=limit)
+        return {
+            **growth,
+            "sessions_before": before,
+            "sessions_after": await session_sizes(session_manager),
+        }
@@ -0,0 +1,218 @@
+import os
+import time
+import asyncio
+import itertools
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+from personal_agent.metrics import inc, set_gauge
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+BULK = "bulk"
+PRIORITIES = {INTERACTIVE: 0, BACKGROUND: 1, BULK: 2}
+
+MODEL = "model"
+MCP = "mcp"
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The work's deadline passed while it was still queued for a slot"""
+
+
+class WorkContext:
+    def __init__(
+        self,
+        priority: str = INTERACTIVE,
+        user_id: Optional[str] = None,
+        deadline: Optional[float] = None,
+        session_id: Optional[str] = None
+    ):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        self.priority = priority
+        self.user_id = user_id
+        self.session_id = session_id
+        # time.monotonic() by which the work must have started
+        self.deadline = deadline
+
+
+current_work: ContextVar[WorkContext] = ContextVar("current_work", default=WorkContext())
+
+
+@contextmanager
+def work_context(
+    priority: str = INTERACTIVE,
+    user_id: Optional[str] = None,
+    deadline_seconds: Optional[float] = None,
+    session_id: Optional[str] = None
+):
+    """Tag everything started inside, including tasks it spawns, with a priority class and user"""
+    deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+    token = current_work.set(WorkContext(priority, user_id, deadline, session_id))
+    try:
+        yield
+    finally:
+        current_work.reset(token)
+
+
+class _Waiter:
+    def __init__(self, work: WorkContext, seq: int):
+        self.work = work
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class _Resource:
+    def __init__(self, name: str, capacity: int, reserved: int):
+        if capacity < 1:
+            raise ValueError(f"{name} needs at least one slot, got {capacity}")
+        self.name = name
+        self.capacity = capacity
+        self.reserved = max(min(reserved, capacity - 1), 0)
+        self.in_use = 0
+        self.held = Counter()
+        # Grant number of each user's latest slot, for round-robin between users
+        self.last_grant = {}
+        self.grants = itertools.count()
+        self.waiters = []
+
+    def can_grant(self, work: WorkContext) -> bool:
+        # The last `reserved` slots are kept free for interactive work
+        limit = self.capacity if work.priority == INTERACTIVE else self.capacity - self.reserved
+        return self.in_use < limit
+
+    def forget_if_idle(self, user_id: Optional[str]):
+        # Users with nothing held or queued have no turn to keep; a returning
+        # user ranks as never served, ahead of anyone served since
+        if self.held[user_id] <= 0 and not any(w.work.user_id == user_id for w in self.waiters):
+            self.held.pop(user_id, None)
+            self.last_grant.pop(user_id, None)
+
+    def rank(self, waiter: _Waiter):
+        work = waiter.work
+        return (
+            PRIORITIES[work.priority],
+            # Fair share: users holding fewer slots go first, then whoever was served longest ago
+            self.held[work.user_id],
+            self.last_grant.get(work.user_id, -1),
+            work.deadline if work.deadline is not None else float("inf"),
+            waiter.seq,
+        )
+
+
+class Scheduler:
+    """Hands out model and MCP slots by priority class, per-user fair share and deadline.
+
+    Interactive work always goes ahead of background and bulk work, which
+    also can never take the last `reserved` slots of a resource, so an
+    interactive request finds a free slot as soon as one frees up. Within a
+    class, users holding fewer slots go first, then users served least
+    recently, so one user's sweep is interleaved with everyone else's calls;
+    a user's own calls go by earliest deadline.
+    """
+
+    def __init__(self, limits: Dict[str, int], *, reserved: int = 1):
+        self.resources = {
+            name: _Resource(name, capacity, reserved) for name, capacity in limits.items()
+        }
+        self._seq = itertools.count()
+
+    def _grant(self, resource: _Resource, work: WorkContext):
+        resource.in_use += 1
+        resource.held[work.user_id] += 1
+        resource.last_grant[work.user_id] = next(resource.grants)
+
+    def _release(self, resource: _Resource, work: WorkContext):
+        resource.in_use -= 1
+        resource.held[work.user_id] -= 1
+        resource.forget_if_idle(work.user_id)
+        self._dispatch(resource)
+
+    def _dispatch(self, resource: _Resource):
+        while resource.waiters:
+            eligible = [w for w in resource.waiters if resource.can_grant(w.work)]
+            if not eligible:
+                break
+            waiter = min(eligible, key=resource.rank)
+            resource.waiters.remove(waiter)
+            self._grant(resource, waiter.work)
+            waiter.future.set_result(None)
+        self._report(resource)
+
+    def _report(self, resource: _Resource):
+        depth = Counter(w.work.priority for w in resource.waiters)
+        for priority in PRIORITIES:
+            set_gauge("scheduler_queue_depth", depth[priority], resource=resource.name, priority=priority)
+        set_gauge("scheduler_slots_in_use", resource.in_use, resource=resource.name)
+
+    async def _acquire(self, resource: _Resource, work: WorkContext):
+        if not resource.waiters and resource.can_grant(work):
+            self._grant(resource, work)
+            self._report(resource)
+            return
+
+        waiter = _Waiter(work, next(self._seq))
+        resource.waiters.append(waiter)
+        # Queued lower-priority work may be waiting on the reservation while this can go now
+        self._dispatch(resource)
+
+        timeout = max(work.deadline - time.monotonic(), 0) if work.deadline is not None else None
+        try:
+            await asyncio.wait([waiter.future], timeout=timeout)
+        except asyncio.CancelledError:
+            if waiter.future.done():
+                self._release(resource, work)
+            else:
+                resource.waiters.remove(waiter)
+                resource.forget_if_idle(work.user_id)
+                self._report(resource)
+            raise
+
+        waited = time.monotonic() - waiter.enqueued
+        inc("scheduler_waits_total", resource=resource.name, priority=work.priority)
+        inc("scheduler_wait_seconds_total", waited, resource=resource.name, priority=work.priority)
+        if not waiter.future.done():
+            resource.waiters.remove(waiter)
+            resource.forget_if_idle(work.user_id)
+            self._report(resource)
+            inc("scheduler_deadline_exceeded_total", resource=resource.name, priority=work.priority)
+            raise DeadlineExceeded(f"Waited {waited:.1f}s for a {resource.name} slot past the deadline")
+
+    async def acquire(self, name: str) -> Callable[[], None]:
+        """Take one slot of resource `name` for the current work context; returns its release function"""
+        resource = self.resources[name]
+        work = current_work.get()
+        await self._acquire(resource, work)
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._release(resource, work)
+
+        return release
+
+    @asynccontextmanager
+    async def slot(self, name: str):
+        """Hold one slot of resource `name` for the current work context"""
+        release = await self.acquire(name)
+        try:
+            yield
+        finally:
+            release()
+
+
+# Global scheduler instance
+scheduler = Scheduler({
+    MODEL: int(os.getenv("PERSONAL_AGENT_MODEL_CONCURRENCY", "8")),
+    MCP: int(os.getenv("PERSONAL_AGENT_MCP_CONCURRENCY", "4")),
+})
+
+# Export convenience functions
+acquire = scheduler.acquire
+slot = scheduler.slot
@@ -0,0 +1,171 @@
+import json
+import time
+import uuid
+import asyncio
+from collections import deque
+from itertools import islice
+from typing import AsyncIterator, Optional, Tuple
+
+from fastapi import Request
+
+from personal_agent.metrics import inc
+
+# How long a turn keeps running with no client attached before it is cancelled
+RESUME_GRACE_SECONDS = 15
+# How long a finished turn stays around for late reconnects
+RETAIN_SECONDS = 5 * 60
+
+
+class TurnStream:
+    """SSE frames of one agent turn, produced in the background and kept in a ring buffer.
+
+    Every frame gets an `id: <turn_id>:<seq>` line, so a client that lost its
+    connection can reconnect with `Last-Event-ID` and continue from the buffer
+    while the turn keeps running. A turn with no client attached for
+    `grace` seconds is cancelled, which cancels the runner and any model or
+    MCP call it is waiting on.
+    """
+
+    def __init__(
+        self,
+        turn_id: str,
+        user_id: str,
+        frames: AsyncIterator[str],
+        *,
+        buffer_size: int = 1024,
+        grace: float = RESUME_GRACE_SECONDS
+    ):
+        self.turn_id = turn_id
+        self.user_id = user_id
+        self.buffer = deque(maxlen=buffer_size)
+        self.next_seq = 0
+        self.grace = grace
+        self.subscribers = 0
+        self.done = False
+        self.finished_at = None
+
+        self._changed = asyncio.Event()
+        self._orphan_timer = None
+        self.task = asyncio.create_task(self._run(frames))
+
+    def _notify(self):
+        # Wake every current waiter; later waiters pick up the fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def _append(self, frame: str):
+        self.buffer.append((self.next_seq, frame))
+        self.next_seq += 1
+
+    async def _run(self, frames: AsyncIterator[str]):
+        try:
+            async for frame in frames:
+                self._append(frame)
+                self._notify()
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            self._append(f"event: error\ndata: {json.dumps({'message': detail}, ensure_ascii=False)}\n\n")
+        finally:
+            # Lets clients tell a finished turn from a dropped connection
+            self._append("event: done\ndata: {}\n\n")
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._notify()
+
+    def _attach(self):
+        self.subscribers += 1
+        if self._orphan_timer is not None:
+            self._orphan_timer.cancel()
+            self._orphan_timer = None
+
+    def _detach(self):
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self.done:
+            loop = asyncio.get_running_loop()
+            self._orphan_timer = loop.call_later(self.grace, self._cancel_if_orphaned)
+
+    def _cancel_if_orphaned(self):
+        self._orphan_timer = None
+        if self.subscribers == 0 and not self.done:
+            self.task.cancel()
+            inc("agent_turns_cancelled_total")
+
+    async def subscribe(self, request: Request, after: int = -1, *, poll_interval: float = 0.5):
+        """Yield buffered and live frames with a sequence number above `after`"""
+        self._attach()
+        seq = after + 1
+        try:
+            while True:
+                # Taken before reading the buffer: a frame appended while we are
+                # suspended in a yield below sets this event, not a later one
+                changed = self._changed
+                oldest = self.buffer[0][0] if self.buffer else self.next_seq
+                if seq < oldest:
+                    # The ring buffer has already dropped these frames
+                    yield f"event: gap\ndata: {json.dumps({'missed': oldest - seq})}\n\n"
+                    seq = oldest
+
+                for frame_seq, frame in list(islice(self.buffer, seq - oldest, None)):
+                    yield f"id: {self.turn_id}:{frame_seq}\n{frame}"
+                    seq = frame_seq + 1
+
+                if self.done and seq >= self.next_seq:
+                    return
+                if seq < self.next_seq:
+                    continue
+
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+        finally:
+            if not (self.done and seq >= self.next_seq):
+                inc("sse_client_disconnects_total")
+            self._detach()
+
+
+class TurnRegistry:
+    """In-flight and recently finished turns, looked up by SSE event id"""
+
+    def __init__(self, *, retain: float = RETAIN_SECONDS):
+        self.retain = retain
+        self.turns = {}
+
+    def prune(self):
+        now = time.monotonic()
+        expired = [
+            turn_id for turn_id, turn in self.turns.items()
+            if turn.done and now - turn.finished_at > self.retain
+        ]
+        for turn_id in expired:
+            del self.turns[turn_id]
+
+    def start(self, user_id: str, frames: AsyncIterator[str]) -> TurnStream:
+        self.prune()
+        turn = TurnStream(uuid.uuid4().hex, user_id, frames)
+        self.turns[turn.turn_id] = turn
+        return turn
+
+    def resume(self, last_event_id: Optional[str], user_id: str) -> Tuple[Optional[TurnStream], int]:
+        """Find the turn a `Last-Event-ID` belongs to and the last sequence the client saw.
+
+        Returns no turn when it is gone or the client has already seen all
+        of it, including the done frame, so there is nothing to stream.
+        """
+        # Reconnects may be all that happens for a while; expire turns here too
+        self.prune()
+        if not last_event_id or ":" not in last_event_id:
+            return None, -1
+
+        turn_id, _, seq = last_event_id.partition(":")
+        turn = self.turns.get(turn_id)
+        if turn is None or turn.user_id != user_id or not seq.isdigit():
+            return None, -1
+
+        after = int(seq)
+        if turn.done and after >= turn.next_seq - 1:
+            return None, after
+
+        inc("sse_resumes_total")
+        return turn, after
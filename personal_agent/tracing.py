@@ -70,7 +70,8 @@ class TracingManager:
             user_id=user_id
         )
     
-    def create_span(self, trace_id: str, name: str, input_data: dict = None):
+    def create_span(self, trace_id: str, name: str, input_data: dict = None,
+                    output_data: dict = None, metadata: dict = None):
         """Create a span within a trace"""
         if not self.enabled:
             return None
@@ -78,11 +79,14 @@ class TracingManager:
         return self.langfuse_client.span(
             trace_id=trace_id,
             name=name,
-            input=input_data
+            input=input_data,
+            output=output_data,
+            metadata=metadata
         )
     
     def log_generation(self, trace_id: str, name: str, input_data: dict = None, 
-                      output_data: dict = None, model: str = None, usage: dict = None):
+                      output_data: dict = None, model: str = None, usage: dict = None,
+                      metadata: dict = None):
         """Log a generation event"""
         if not self.enabled:
             return None
@@ -93,7 +97,8 @@ class TracingManager:
             input=input_data,
             output=output_data,
             model=model,
-            usage=usage
+            usage=usage,
+            metadata=metadata
         )
     
     def flush(self):
@@ -0,0 +1,209 @@
+import os
+import math
+import hashlib
+import time
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from personal_agent.metrics import inc, set_gauge, remove_gauge
+from personal_agent.scheduler import current_work, INTERACTIVE
+
+
+def user_label(user_id: str) -> str:
+    """Metric label for a user: ids come from a client cookie, so never use them raw"""
+    return hashlib.sha256(user_id.encode()).hexdigest()[:12]
+
+
+def usage_counts(usage_metadata) -> Counter:
+    """Prompt/completion/total token counts of a Gemini usage_metadata"""
+    prompt = usage_metadata.prompt_token_count or 0
+    # Thinking tokens are billed as output
+    completion = (usage_metadata.candidates_token_count or 0) + (getattr(usage_metadata, "thoughts_token_count", None) or 0)
+    return Counter(
+        prompt=prompt,
+        completion=completion,
+        total=usage_metadata.total_token_count or prompt + completion
+    )
+
+
+class TurnUsage:
+    """Tokens spent by one agent turn, including tool-internal model calls"""
+
+    def __init__(self):
+        self.tokens = Counter()
+        self.by_model: Dict[str, Counter] = {}
+        self.calls = 0
+
+    def add(self, model: str, counts: Counter):
+        self.calls += 1
+        self.tokens.update(counts)
+        self.by_model.setdefault(model, Counter()).update(counts)
+
+    def to_langfuse(self) -> dict:
+        return {
+            "input": self.tokens["prompt"],
+            "output": self.tokens["completion"],
+            "total": self.tokens["total"],
+            "unit": "TOKENS",
+        }
+
+
+current_turn: ContextVar[Optional[TurnUsage]] = ContextVar("current_turn", default=None)
+
+
+@contextmanager
+def track_turn():
+    """Collect the token usage of everything started inside, including tasks it spawns"""
+    turn = TurnUsage()
+    token = current_turn.set(turn)
+    try:
+        yield turn
+    finally:
+        current_turn.reset(token)
+
+
+class UsageLedger:
+    """Rolling-window token totals per user and session, with optional per-user budgets.
+
+    Totals are kept in `bucket_seconds` buckets and drop out once they are
+    older than `window_seconds`. With a `budget` (tokens per user per
+    window), a user past `downgrade_at` of it gets `downgrade_model` instead
+    of each stage's primary model, and background/bulk turns are refused.
+    Past the full budget every new turn is refused until enough of the
+    window has expired.
+    """
+
+    def __init__(
+        self,
+        *,
+        window_seconds: float = 3600,
+        bucket_seconds: float = 60,
+        budget: Optional[int] = None,
+        downgrade_at: float = 0.8,
+        downgrade_model: Optional[str] = None
+    ):
+        self.window_seconds = window_seconds
+        self.bucket_seconds = bucket_seconds
+        self.budget = budget
+        self.downgrade_at = downgrade_at
+        self.downgrade_model = downgrade_model
+        self._buckets: Dict[Tuple[str, str], deque] = {}
+        self._totals: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def _expire(self, key: Tuple[str, str], now: float):
+        buckets = self._buckets.get(key)
+        while buckets and buckets[0][0] <= now - self.window_seconds:
+            _, tokens = buckets.popleft()
+            self._totals[key] -= tokens
+        if buckets is not None and not buckets:
+            del self._buckets[key]
+            del self._totals[key]
+            if key[0] == "user":
+                remove_gauge("user_tokens_window", user=user_label(key[1]))
+
+    def _add(self, key: Tuple[str, str], tokens: int, now: float):
+        start = now - now % self.bucket_seconds
+        buckets = self._buckets.setdefault(key, deque())
+        if buckets and buckets[-1][0] == start:
+            buckets[-1][1] += tokens
+        else:
+            buckets.append([start, tokens])
+        self._totals[key] += tokens
+        self._expire(key, now)
+
+    def _sweep(self, now: float):
+        for key in list(self._buckets):
+            self._expire(key, now)
+
+    def record(self, model: str, usage_metadata):
+        """Account one model response to the current work's user, session and turn"""
+        counts = usage_counts(usage_metadata)
+        for kind in ("prompt", "completion"):
+            inc("llm_tokens_total", counts[kind], model=model, kind=kind)
+
+        turn = current_turn.get()
+        if turn is not None:
+            turn.add(model, counts)
+
+        work = current_work.get()
+        now = time.monotonic()
+        with self._lock:
+            if work.user_id is not None:
+                self._add(("user", work.user_id), counts["total"], now)
+                set_gauge("user_tokens_window", self._totals[("user", work.user_id)], user=user_label(work.user_id))
+            if work.session_id is not None:
+                self._add(("session", work.session_id), counts["total"], now)
+            # Drop idle users' and sessions' windows now and then
+            if len(self._buckets) > 1000:
+                self._sweep(now)
+
+    def _window(self, kind: str, name: str) -> int:
+        key = (kind, name)
+        with self._lock:
+            self._expire(key, time.monotonic())
+            return self._totals.get(key, 0)
+
+    def user_tokens(self, user_id: str) -> int:
+        return self._window("user", user_id)
+
+    def session_tokens(self, session_id: str) -> int:
+        return self._window("session", session_id)
+
+    def model_for(self, user_id: Optional[str]) -> Optional[str]:
+        """The model to use instead of the primary one, if the user is close to their budget"""
+        if not self.budget or not self.downgrade_model or user_id is None:
+            return None
+        if self.user_tokens(user_id) >= self.budget * self.downgrade_at:
+            return self.downgrade_model
+        return None
+
+    def retry_after(self, user_id: str, priority: str = INTERACTIVE) -> Optional[int]:
+        """Seconds until the user may start a turn of `priority`, or None if they may now"""
+        if not self.budget:
+            return None
+        limit = self.budget if priority == INTERACTIVE else self.budget * self.downgrade_at
+        key = ("user", user_id)
+        with self._lock:
+            now = time.monotonic()
+            self._expire(key, now)
+            used = self._totals.get(key, 0)
+            if used < limit:
+                return None
+            # Wait until enough of the oldest buckets have left the window
+            for start, tokens in self._buckets.get(key, ()):
+                used -= tokens
+                if used < limit:
+                    return max(math.ceil(start + self.window_seconds - now), 1)
+        return math.ceil(self.window_seconds)
+
+    def report(self, turn: TurnUsage) -> dict:
+        """Trace metadata for a finished turn of the current work"""
+        work = current_work.get()
+        return {
+            "model_calls": turn.calls,
+            "tokens_by_model": {model: dict(counts) for model, counts in turn.by_model.items()},
+            "user_window_tokens": self.user_tokens(work.user_id) if work.user_id is not None else None,
+            "session_window_tokens": self.session_tokens(work.session_id) if work.session_id is not None else None,
+            "window_seconds": self.window_seconds,
+        }
+
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+# Global usage ledger instance
+usage_ledger = UsageLedger(
+    window_seconds=float(os.getenv("PERSONAL_AGENT_TOKEN_WINDOW_SECONDS", "3600")),
+    budget=_optional_int("PERSONAL_AGENT_USER_TOKEN_BUDGET"),
+    downgrade_at=float(os.getenv("PERSONAL_AGENT_BUDGET_DOWNGRADE_AT", "0.8")),
+    downgrade_model=os.getenv("PERSONAL_AGENT_BUDGET_DOWNGRADE_MODEL") or None
+)
+
+# Export convenience functions
+record_usage = usage_ledger.record
@@ -0,0 +1,46 @@
+import asyncio
+
+from personal_agent.agents import ArxivResearchAgent
+
+
+def test_shared_analysis_is_cancelled_only_when_no_caller_waits(tmp_path):
+    agent = ArxivResearchAgent(storage_path=str(tmp_path))
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def read_paper(paper_id):
+        return {'status': 'success', 'content': 'paper text'}
+
+    async def prompt_version(prompt_name):
+        return "v1"
+
+    async def generate_analysis(llm, paper_id, content, prompt_version, paper_hash):
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    agent.mcp_client.read_paper = read_paper
+    agent.mcp_client.prompt_version = prompt_version
+    agent._generate_analysis = generate_analysis
+
+    async def main():
+        first = asyncio.create_task(agent.analyze_paper_deeply("2308.04079"))
+        second = asyncio.create_task(agent.analyze_paper_deeply("2308.04079"))
+        await asyncio.wait_for(started.wait(), 5)
+        await asyncio.sleep(0.01)
+        assert len(agent._analyses_in_flight) == 1
+
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        assert not cancelled.is_set()
+
+        second.cancel()
+        await asyncio.gather(second, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 5)
+        assert not agent._analyses_in_flight
+
+    asyncio.run(main())
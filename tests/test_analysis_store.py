@@ -0,0 +1,39 @@
+import asyncio
+
+from personal_agent.agents import ArxivResearchAgent
+from personal_agent.agents.arxiv.analysis_store import content_hash
+
+
+def test_stored_analysis_requires_current_text_and_prompt(tmp_path):
+    agent = ArxivResearchAgent(storage_path=str(tmp_path))
+    paper = {'status': 'success', 'content': 'paper text'}
+    prompt = {'version': 'p1'}
+
+    async def read_paper(paper_id):
+        return paper
+
+    async def prompt_version(prompt_name):
+        return prompt['version']
+
+    agent.mcp_client.read_paper = read_paper
+    agent.mcp_client.prompt_version = prompt_version
+
+    async def main():
+        prompt_version = await agent._prompt_version()
+        agent.analysis_store.put("2308.04079", prompt_version, "model", content_hash("paper text"), "analysis")
+        found = await agent.stored_analysis("2308.04079")
+
+        paper['content'] = 'revised paper text'
+        after_redownload = await agent.stored_analysis("2308.04079")
+
+        paper['content'] = 'paper text'
+        prompt['version'] = 'p2'
+        after_prompt_change = await agent.stored_analysis("2308.04079")
+        return found, after_redownload, after_prompt_change
+
+    found, after_redownload, after_prompt_change = asyncio.run(main())
+    agent.analysis_store.close()
+
+    assert found['analysis'] == "analysis"
+    assert after_redownload is None
+    assert after_prompt_change is None
@@ -0,0 +1,54 @@
+import os
+import time
+import asyncio
+
+from google.genai import types
+
+from personal_agent.artifacts import LocalArtifactService
+
+
+def save(service, session_id, filename):
+    return service.save_artifact(
+        app_name="app", user_id="u", session_id=session_id, filename=filename,
+        artifact=types.Part(text="result")
+    )
+
+
+def keys(service, session_id):
+    return service.list_artifact_keys(app_name="app", user_id="u", session_id=session_id)
+
+
+def test_delete_session_keeps_user_artifacts(tmp_path):
+    service = LocalArtifactService(str(tmp_path))
+
+    async def main():
+        await save(service, "s1", "tool_result_1")
+        await save(service, "s1", "user:notes")
+        await save(service, "s2", "tool_result_2")
+
+        await service.delete_session(app_name="app", user_id="u", session_id="s1")
+        assert await keys(service, "s1") == ["user:notes"]
+        assert await keys(service, "s2") == ["tool_result_2", "user:notes"]
+
+    asyncio.run(main())
+
+
+def test_expire_removes_only_stale_sessions(tmp_path):
+    service = LocalArtifactService(str(tmp_path))
+
+    async def main():
+        await save(service, "old", "tool_result_1")
+        await save(service, "new", "tool_result_2")
+        await save(service, "old", "user:notes")
+
+    asyncio.run(main())
+    stale = time.time() - 7200
+    for root, dirs, files in os.walk(tmp_path / "app" / "u" / "old"):
+        for name in dirs + files:
+            os.utime(os.path.join(root, name), (stale, stale))
+    os.utime(tmp_path / "app" / "u" / "old", (stale, stale))
+
+    assert service.expire(3600) == 1
+    assert not (tmp_path / "app" / "u" / "old").exists()
+    assert (tmp_path / "app" / "u" / "new").exists()
+    assert (tmp_path / "app" / "u" / "user").exists()
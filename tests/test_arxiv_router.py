@@ -0,0 +1,51 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from personal_agent.router.arxiv import router
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    async def read_paper(self, paper_id):
+        self.calls.append(("read", paper_id))
+        return {"status": "success", "paper_id": paper_id}
+
+    async def download_paper(self, paper_id):
+        self.calls.append(("download", paper_id))
+        return {"status": "success", "paper_id": paper_id}
+
+
+class FakeAgent:
+    async def stored_analysis(self, paper_id):
+        return {"paper_id": paper_id}
+
+
+def make_client():
+    app = FastAPI()
+    app.include_router(router)
+    app.state.arxiv_client = FakeClient()
+    app.state.arxiv_agent = FakeAgent()
+    return app, TestClient(app)
+
+
+def test_old_style_ids_reach_every_paper_route():
+    app, client = make_client()
+
+    assert client.get("/arxiv/papers/hep-th/9901001").json()["paper_id"] == "hep-th/9901001"
+    assert client.get("/arxiv/papers/hep-th%2F9901001").json()["paper_id"] == "hep-th/9901001"
+    assert client.post("/arxiv/papers/hep-th/9901001/download").json()["paper_id"] == "hep-th/9901001"
+    assert client.get("/arxiv/papers/hep-th/9901001/analysis").json()["paper_id"] == "hep-th/9901001"
+    assert app.state.arxiv_client.calls == [
+        ("read", "hep-th/9901001"),
+        ("read", "hep-th/9901001"),
+        ("download", "hep-th/9901001"),
+    ]
+
+
+def test_new_style_ids_still_route():
+    app, client = make_client()
+
+    assert client.get("/arxiv/papers/2308.04079").json()["paper_id"] == "2308.04079"
+    assert client.get("/arxiv/papers/2308.04079/analysis").json()["paper_id"] == "2308.04079"
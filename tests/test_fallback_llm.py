@@ -0,0 +1,98 @@
+import asyncio
+from typing import List, Optional
+
+import pytest
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.genai import types
+
+from personal_agent.models import FallbackLlm
+
+
+class FakeLlm(BaseLlm):
+    """Answers `texts` after `delay` seconds, or fails with `error`"""
+
+    delay: float = 0
+    error: Optional[str] = None
+    texts: List[str] = ["ok"]
+    started: bool = False
+    finished: bool = False
+    closed: bool = False
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.started = True
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise RuntimeError(self.error)
+            for text in self.texts:
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
+            self.finished = True
+        finally:
+            self.closed = True
+
+
+def fallback(fakes, **kwargs):
+    llm = FallbackLlm(model=fakes[0].model, fallbacks=[fake.model for fake in fakes[1:]], **kwargs)
+    by_name = {fake.model: fake for fake in fakes}
+    llm.wrap_models(lambda inner: by_name[inner.model])
+    return llm
+
+
+def generate(llm):
+    async def main():
+        request = LlmRequest(contents=[types.Content(role="user", parts=[types.Part(text="hi")])])
+        return [
+            ((response.custom_metadata or {}).get("model"), response.content.parts[0].text)
+            async for response in llm.generate_content_async(request)
+        ]
+    return asyncio.run(main())
+
+
+def test_error_falls_back_to_next_model():
+    primary = FakeLlm(model="gemini-fake-primary", error="overloaded")
+    backup = FakeLlm(model="gemini-fake-backup", texts=["a", "b"])
+
+    assert generate(fallback([primary, backup])) == [("gemini-fake-backup", "a"), ("gemini-fake-backup", "b")]
+
+
+def test_last_error_is_raised_when_every_model_fails():
+    primary = FakeLlm(model="gemini-fake-primary", error="overloaded")
+    backup = FakeLlm(model="gemini-fake-backup", error="down")
+
+    with pytest.raises(RuntimeError, match="down"):
+        generate(fallback([primary, backup]))
+
+
+def test_timeout_falls_back_and_closes_the_slow_model():
+    primary = FakeLlm(model="gemini-fake-primary", delay=5)
+    backup = FakeLlm(model="gemini-fake-backup")
+
+    llm = fallback([primary, backup], timeouts={"gemini-fake-primary": 0.05})
+
+    assert generate(llm) == [("gemini-fake-backup", "ok")]
+    assert primary.closed and not primary.finished
+
+
+def test_hedge_is_won_by_the_first_model_to_answer():
+    primary = FakeLlm(model="gemini-fake-primary", delay=5)
+    backup = FakeLlm(model="gemini-fake-backup", delay=0.05)
+
+    assert generate(fallback([primary, backup], hedge_after=0.05)) == [("gemini-fake-backup", "ok")]
+    # The loser is cancelled and closed, not left running
+    assert primary.closed and not primary.finished
+
+
+def test_hedge_keeps_the_primary_when_it_answers_first():
+    primary = FakeLlm(model="gemini-fake-primary", delay=0.1)
+    backup = FakeLlm(model="gemini-fake-backup", delay=5)
+
+    assert generate(fallback([primary, backup], hedge_after=0.05)) == [("gemini-fake-primary", "ok")]
+    assert backup.started and backup.closed and not backup.finished
+
+
+def test_no_hedge_before_hedge_after():
+    primary = FakeLlm(model="gemini-fake-primary", delay=0.05)
+    backup = FakeLlm(model="gemini-fake-backup")
+
+    assert generate(fallback([primary, backup], hedge_after=1)) == [("gemini-fake-primary", "ok")]
+    assert not backup.started
@@ -0,0 +1,20 @@
+from personal_agent.mcp.client.manifest import PaperManifest
+
+
+def test_old_style_ids_are_listed(tmp_path):
+    (tmp_path / "2308.04079.md").write_text("# New style\n")
+    (tmp_path / "hep-th").mkdir()
+    (tmp_path / "hep-th" / "9901001.md").write_text("# Old style\n")
+
+    manifest = PaperManifest(str(tmp_path), scan_interval=0)
+    assert sorted(paper["id"] for paper in manifest.query()["papers"]) == ["2308.04079", "hep-th/9901001"]
+    assert manifest.get("hep-th/9901001")["title"] == "Old style"
+
+    # A paper added to an existing archive directory doesn't change the storage directory's mtime
+    (tmp_path / "hep-th" / "9901002.md").write_text("# Another\n")
+    assert manifest.get("hep-th/9901002")["title"] == "Another"
+
+    # The entries survive a reload from the manifest logs
+    reloaded = PaperManifest(str(tmp_path))
+    reloaded._load()
+    assert set(reloaded.papers) == {"2308.04079", "hep-th/9901001", "hep-th/9901002"}
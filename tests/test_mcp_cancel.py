@@ -0,0 +1,88 @@
+import asyncio
+
+import anyio
+import pytest
+from mcp.server.fastmcp import FastMCP
+from mcp.shared.memory import create_client_server_memory_streams
+from google.adk.tools.mcp_tool.mcp_tool import MCPTool
+
+from personal_agent.mcp.server.arxiv import ArxivClientSession
+
+
+class SessionManager:
+    def __init__(self, session):
+        self.session = session
+
+    async def create_session(self):
+        return self.session
+
+    async def close(self):
+        pass
+
+
+def test_cancelled_agent_tool_call_is_cancelled_on_server():
+    server = FastMCP("test")
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    @server.tool()
+    async def read_paper(paper_id: str) -> str:
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return paper_id
+
+    async def main():
+        async with create_client_server_memory_streams() as (client_streams, server_streams):
+            async with anyio.create_task_group() as tg:
+                mcp_server = server._mcp_server
+                tg.start_soon(lambda: mcp_server.run(
+                    *server_streams, mcp_server.create_initialization_options()
+                ))
+                async with ArxivClientSession(*client_streams) as session:
+                    await session.initialize()
+                    tool = (await session.list_tools()).tools[0]
+                    agent_tool = MCPTool(mcp_tool=tool, mcp_session_manager=SessionManager(session))
+
+                    call = asyncio.create_task(agent_tool.run_async(args={"paper_id": "2308.04079"}, tool_context=None))
+                    await asyncio.wait_for(started.wait(), 5)
+                    call.cancel()
+                    await asyncio.gather(call, return_exceptions=True)
+
+                    await asyncio.wait_for(cancelled.wait(), 5)
+                tg.cancel_scope.cancel()
+
+    asyncio.run(main())
+
+
+def test_request_in_flight_fails_when_connection_closes():
+    server = FastMCP("test")
+    started = asyncio.Event()
+
+    @server.tool()
+    async def read_paper(paper_id: str) -> str:
+        started.set()
+        await asyncio.sleep(30)
+        return paper_id
+
+    async def main():
+        async with create_client_server_memory_streams() as (client_streams, server_streams):
+            async with anyio.create_task_group() as tg:
+                mcp_server = server._mcp_server
+                tg.start_soon(lambda: mcp_server.run(
+                    *server_streams, mcp_server.create_initialization_options()
+                ))
+                async with ArxivClientSession(*client_streams) as session:
+                    await session.initialize()
+                    call = asyncio.create_task(session.call_tool("read_paper", {"paper_id": "2308.04079"}))
+                    await asyncio.wait_for(started.wait(), 5)
+
+                # The closed-resource error is what MCPTool reconnects and retries on
+                with pytest.raises(anyio.ClosedResourceError):
+                    await asyncio.wait_for(call, 5)
+                tg.cancel_scope.cancel()
+
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+import time
+import asyncio
+
+from google.adk.events import Event
+from google.adk.sessions import Session
+from google.genai import types
+
+from personal_agent.memory import LocalMemoryService
+
+
+def event(text, author="user", timestamp=None):
+    return Event(
+        author=author,
+        content=types.Content(role="user" if author == "user" else "model", parts=[types.Part(text=text)]),
+        timestamp=timestamp or time.time()
+    )
+
+
+def session(user_id, *events):
+    return Session(id=f"session_{user_id}", app_name="app", user_id=user_id, events=list(events))
+
+
+def search(service, user_id, query):
+    response = asyncio.run(service.search_memory(app_name="app", user_id=user_id, query=query))
+    return [memory.content.parts[0].text for memory in response.memories]
+
+
+def stored(service, user_id):
+    return [row[0] for row in service._conn.execute(
+        "SELECT text FROM memories WHERE user_id = ? ORDER BY timestamp", (user_id,)
+    )]
+
+
+def test_ingest_stores_each_event_once(tmp_path):
+    service = LocalMemoryService(str(tmp_path / "memory.db"))
+    first = session("alice", event("I am reading about gaussian splatting"), event("Noted", author="agent"))
+    asyncio.run(service.add_session_to_memory(first))
+    assert search(service, "alice", "gaussian splatting") == ["I am reading about gaussian splatting"]
+
+    # Ingesting the grown session adds only its new events
+    first.events.append(event("Also diffusion models"))
+    asyncio.run(service.add_session_to_memory(first))
+    assert stored(service, "alice") == ["I am reading about gaussian splatting", "Noted", "Also diffusion models"]
+    assert search(service, "alice", "diffusion") == ["Also diffusion models"]
+
+
+def test_recreated_session_events_become_searchable(tmp_path):
+    service = LocalMemoryService(str(tmp_path / "memory.db"))
+    asyncio.run(service.add_session_to_memory(
+        session("alice", event("first question"), event("first answer", author="agent"), event("follow-up"))
+    ))
+
+    # The session expired and was recreated under the same id with fewer, new events
+    asyncio.run(service.add_session_to_memory(session("alice", event("quantum error correction"))))
+    assert search(service, "alice", "quantum error correction") == ["quantum error correction"]
+    assert len(stored(service, "alice")) == 4
+
+
+def test_max_entries_prunes_only_the_users_oldest(tmp_path):
+    service = LocalMemoryService(str(tmp_path / "memory.db"), max_entries=3)
+    now = time.time()
+    asyncio.run(service.add_session_to_memory(session("bob", event("bob likes transformers", timestamp=now - 100))))
+    asyncio.run(service.add_session_to_memory(session("alice", *(
+        event(f"note number {i} about transformers", timestamp=now - 50 + i) for i in range(5)
+    ))))
+
+    assert stored(service, "alice") == [f"note number {i} about transformers" for i in (2, 3, 4)]
+    assert stored(service, "bob") == ["bob likes transformers"]
+    assert service._conn.execute("SELECT COUNT(*) FROM memories_fts").fetchone()[0] == 4
+
+    # Searches only see the user's own memories
+    assert "bob likes transformers" not in search(service, "alice", "transformers")
+    assert search(service, "bob", "transformers") == ["bob likes transformers"]
+
+
+def test_older_memories_decay(tmp_path):
+    now = time.time()
+    events = [
+        event("reading group meeting about sparse attention", timestamp=now - 5 * 24 * 60 * 60),
+        event("reading group meeting", timestamp=now - 60),
+    ]
+    query = "reading group meeting about sparse attention"
+
+    # Without decay the closer match wins
+    service = LocalMemoryService(str(tmp_path / "kept.db"), half_life_days=10000)
+    asyncio.run(service.add_session_to_memory(session("alice", *events)))
+    assert search(service, "alice", query)[0] == "reading group meeting about sparse attention"
+
+    service = LocalMemoryService(str(tmp_path / "decayed.db"), half_life_days=1)
+    asyncio.run(service.add_session_to_memory(session("alice", *events)))
+    assert search(service, "alice", query) == ["reading group meeting", "reading group meeting about sparse attention"]
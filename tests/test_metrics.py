@@ -0,0 +1,21 @@
+from personal_agent.metrics import MetricsRegistry
+from personal_agent.usage import user_label
+
+
+def test_label_values_are_escaped():
+    metrics = MetricsRegistry()
+    metrics.set("user_tokens_window", 5, user='x"} 1\nfake_metric{a="b\\')
+
+    lines = metrics.render().splitlines()
+
+    assert lines == [
+        "# TYPE user_tokens_window gauge",
+        'user_tokens_window{user="x\\"} 1\\nfake_metric{a=\\"b\\\\"} 5',
+    ]
+
+
+def test_user_label_hides_the_user_id():
+    label = user_label('x"} 1\nfake_metric{a="b')
+
+    assert label == user_label('x"} 1\nfake_metric{a="b')
+    assert label.isalnum() and len(label) == 12
@@ -0,0 +1,45 @@
+import asyncio
+
+from google.adk.tools import FunctionTool
+
+from personal_agent.replay import Cassette, TrafficRecorder, TrafficReplayer
+from personal_agent.replay.cassette import current_tool_call, request_key, tag_tool_call
+
+
+async def analyze_paper_deeply(paper_id: str) -> dict:
+    """Stand-in for a tool that answers from local state"""
+    return {"status": "success", "cached": True}
+
+
+def test_local_tool_results_are_replayed_without_their_inner_traffic(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    tool = FunctionTool(analyze_paper_deeply)
+    args = {"paper_id": "2308.04079"}
+
+    recorder = TrafficRecorder(path)
+    recorder.before_tool(tool, args, None)
+    # A model call made while the tool runs, e.g. generating the analysis
+    recorder.writer.write(tag_tool_call(
+        {"kind": "llm", "name": "model", "key": "inner", "chunks": []}, current_tool_call.get()
+    ))
+    recorder.after_tool(tool, args, None, {"status": "success", "cached": True})
+    recorder.writer.write({"kind": "llm", "name": "model", "key": "outer", "chunks": []})
+    recorder.close()
+
+    replayer = TrafficReplayer(Cassette.load(path), time_scale=0)
+    response = asyncio.run(replayer.before_tool(tool, args, None))
+
+    assert response == {"status": "success", "cached": True}
+    # The next model request gets the next model call outside the tool, not the one inside it
+    assert replayer.player.take("llm", "model", request_key("llm", "model", {}))["key"] == "outer"
+    assert replayer.player.take("llm", "model", request_key("llm", "model", {})) is None
+
+
+def test_unrecorded_tool_runs_live(tmp_path):
+    path = str(tmp_path / "cassette.jsonl")
+    TrafficRecorder(path).close()
+
+    replayer = TrafficReplayer(Cassette.load(path), time_scale=0)
+    tool = FunctionTool(analyze_paper_deeply)
+
+    assert asyncio.run(replayer.before_tool(tool, {"paper_id": "2308.04079"}, None)) is None
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from personal_agent.scheduler import Scheduler, DeadlineExceeded, work_context, INTERACTIVE, BACKGROUND, BULK
+
+
+async def acquire_as(scheduler, priority, user_id, deadline_seconds=None):
+    with work_context(priority, user_id, deadline_seconds):
+        return await scheduler.acquire("model")
+
+
+def queue(scheduler, priority, user_id, order, deadline_seconds=None):
+    async def run():
+        release = await acquire_as(scheduler, priority, user_id, deadline_seconds)
+        order.append(user_id)
+        return release
+    return asyncio.create_task(run())
+
+
+def assert_idle(resource):
+    assert resource.in_use == 0
+    assert resource.waiters == []
+    assert not +resource.held
+    assert resource.last_grant == {}
+
+
+def test_interactive_work_jumps_queued_bulk_work():
+    async def main():
+        scheduler = Scheduler({"model": 1}, reserved=0)
+        release = await acquire_as(scheduler, INTERACTIVE, "holder")
+        order = []
+        bulk = queue(scheduler, BULK, "sweep", order)
+        await asyncio.sleep(0)
+        interactive = queue(scheduler, INTERACTIVE, "user", order)
+        await asyncio.sleep(0)
+
+        release()
+        (await interactive)()
+        (await bulk)()
+        assert order == ["user", "sweep"]
+        assert_idle(scheduler.resources["model"])
+
+    asyncio.run(main())
+
+
+def test_background_work_never_takes_the_reserved_slot():
+    async def main():
+        scheduler = Scheduler({"model": 2}, reserved=1)
+        resource = scheduler.resources["model"]
+        first = await acquire_as(scheduler, BACKGROUND, "a")
+        order = []
+        second = queue(scheduler, BACKGROUND, "b", order)
+        await asyncio.sleep(0.01)
+        # One slot is free, but it is the reserved one
+        assert order == [] and resource.in_use == 1
+
+        interactive = await asyncio.wait_for(acquire_as(scheduler, INTERACTIVE, "c"), 1)
+        assert resource.in_use == 2
+        interactive()
+        await asyncio.sleep(0.01)
+        assert order == []
+
+        first()
+        (await second)()
+        assert order == ["b"]
+        assert_idle(resource)
+
+    asyncio.run(main())
+
+
+def test_users_share_slots_fairly():
+    async def call(scheduler, user_id, order):
+        release = await acquire_as(scheduler, BULK, user_id)
+        order.append(user_id)
+        release()
+
+    async def main():
+        scheduler = Scheduler({"model": 1}, reserved=0)
+        release = await acquire_as(scheduler, BULK, "sweep")
+        order = []
+        tasks = [asyncio.create_task(call(scheduler, "sweep", order)) for _ in range(2)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(call(scheduler, "other", order)))
+        await asyncio.sleep(0)
+
+        release()
+        await asyncio.gather(*tasks)
+        # The other user's call goes ahead of the sweep's queued calls
+        assert order == ["other", "sweep", "sweep"]
+        assert_idle(scheduler.resources["model"])
+
+    asyncio.run(main())
+
+
+def test_deadline_exceeded_leaves_no_state_behind():
+    async def main():
+        scheduler = Scheduler({"model": 1}, reserved=0)
+        release = await acquire_as(scheduler, INTERACTIVE, "holder")
+        with pytest.raises(DeadlineExceeded):
+            await acquire_as(scheduler, INTERACTIVE, "late", deadline_seconds=0.05)
+
+        resource = scheduler.resources["model"]
+        assert resource.waiters == []
+        assert "late" not in resource.held and "late" not in resource.last_grant
+        release()
+        assert_idle(resource)
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def main():
+        scheduler = Scheduler({"model": 1}, reserved=0)
+        resource = scheduler.resources["model"]
+
+        # Cancelled while still queued
+        release = await acquire_as(scheduler, INTERACTIVE, "holder")
+        waiting = asyncio.create_task(acquire_as(scheduler, INTERACTIVE, "gone"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        release()
+        assert_idle(resource)
+
+        # Cancelled after being granted the slot but before it got to run
+        release = await acquire_as(scheduler, INTERACTIVE, "holder")
+        waiting = asyncio.create_task(acquire_as(scheduler, INTERACTIVE, "gone"))
+        await asyncio.sleep(0)
+        release()
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert_idle(resource)
+
+        (await asyncio.wait_for(acquire_as(scheduler, INTERACTIVE, "next"), 1))()
+        assert_idle(resource)
+
+    asyncio.run(main())
@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+from personal_agent.streaming import TurnRegistry, TurnStream
+
+
+class FakeRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def test_slow_subscriber_gets_frames_without_waiting_for_poll():
+    async def frames():
+        for i in range(4):
+            yield f"data: {i}\n\n"
+            # Let the subscriber get suspended in its yield before the next frame
+            await asyncio.sleep(0.01)
+
+    async def main():
+        turn = TurnStream("turn", "user", frames())
+        arrivals = []
+        started = time.monotonic()
+        async for frame in turn.subscribe(FakeRequest(), poll_interval=0.5):
+            arrivals.append(time.monotonic() - started)
+            # A slow consumer: the next frame is produced while this one is being handled
+            await asyncio.sleep(0.02)
+        await turn.task
+        return arrivals
+
+    arrivals = asyncio.run(main())
+
+    # Four data frames plus the closing done frame, none held back by the poll interval
+    assert len(arrivals) == 5
+    assert arrivals[-1] < 0.4
+
+
+def test_subscriber_resumes_after_sequence():
+    async def frames():
+        for i in range(3):
+            yield f"data: {i}\n\n"
+
+    async def main():
+        turn = TurnStream("turn", "user", frames())
+        await turn.task
+        return [frame async for frame in turn.subscribe(FakeRequest(), after=0)]
+
+    received = asyncio.run(main())
+
+    assert received[0].startswith("id: turn:1\n")
+    assert received[-1].endswith("event: done\ndata: {}\n\n")
+
+
+def test_resume_of_fully_delivered_turn_finds_nothing():
+    async def frames():
+        yield "data: 0\n\n"
+
+    async def main():
+        registry = TurnRegistry(retain=60)
+        turn = registry.start("user", frames())
+        await turn.task
+        done_seq = turn.next_seq - 1
+        return (
+            registry.resume(f"{turn.turn_id}:{done_seq - 1}", "user")[0] is turn,
+            registry.resume(f"{turn.turn_id}:{done_seq}", "user")[0],
+        )
+
+    missed_done, finished = asyncio.run(main())
+
+    # A client that missed the done frame still gets it; one that saw it gets a 204
+    assert missed_done
+    assert finished is None
+
+
+def test_resume_prunes_expired_turns():
+    async def frames():
+        yield "data: 0\n\n"
+
+    async def main():
+        registry = TurnRegistry(retain=0)
+        turn = registry.start("user", frames())
+        await turn.task
+        registry.resume(None, "user")
+        return registry.turns
+
+    assert asyncio.run(main()) == {}
@@ -0,0 +1,111 @@
+from google.genai import types
+
+from personal_agent import usage
+from personal_agent.usage import UsageLedger, track_turn
+from personal_agent.scheduler import work_context, INTERACTIVE, BULK
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+def tokens(prompt, completion):
+    return types.GenerateContentResponseUsageMetadata(
+        prompt_token_count=prompt,
+        candidates_token_count=completion,
+        total_token_count=prompt + completion
+    )
+
+
+def ledger(monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(usage, "time", clock)
+    return UsageLedger(window_seconds=10, bucket_seconds=1, **kwargs), clock
+
+
+def test_totals_expire_with_the_window(monkeypatch):
+    usage_ledger, clock = ledger(monkeypatch)
+    with work_context(INTERACTIVE, "alice", session_id="s1"):
+        usage_ledger.record("gemini-a", tokens(30, 10))
+        clock.now += 5
+        usage_ledger.record("gemini-a", tokens(15, 5))
+
+    assert usage_ledger.user_tokens("alice") == 60
+    assert usage_ledger.session_tokens("s1") == 60
+    assert usage_ledger.user_tokens("bob") == 0
+
+    # The first bucket leaves the window, the second is still in it
+    clock.now += 5
+    assert usage_ledger.user_tokens("alice") == 20
+    clock.now += 5
+    assert usage_ledger.user_tokens("alice") == 0
+    assert usage_ledger.session_tokens("s1") == 0
+    assert not usage_ledger._buckets
+
+
+def test_model_for_downgrades_near_the_budget(monkeypatch):
+    usage_ledger, clock = ledger(monkeypatch, budget=100, downgrade_at=0.8, downgrade_model="gemini-lite")
+    with work_context(INTERACTIVE, "alice"):
+        usage_ledger.record("gemini-a", tokens(70, 9))
+        assert usage_ledger.model_for("alice") is None
+        usage_ledger.record("gemini-a", tokens(1, 0))
+        assert usage_ledger.model_for("alice") == "gemini-lite"
+
+    assert usage_ledger.model_for("bob") is None
+    assert usage_ledger.model_for(None) is None
+    clock.now += 10
+    assert usage_ledger.model_for("alice") is None
+
+
+def test_retry_after_waits_for_enough_of_the_window(monkeypatch):
+    usage_ledger, clock = ledger(monkeypatch, budget=100, downgrade_at=0.5)
+    with work_context(INTERACTIVE, "alice"):
+        usage_ledger.record("gemini-a", tokens(40, 0))
+        assert usage_ledger.retry_after("alice") is None
+        assert usage_ledger.retry_after("alice", BULK) is None
+        clock.now += 3
+        usage_ledger.record("gemini-a", tokens(30, 0))
+        # Bulk work stops at half the budget, interactive work at the full budget
+        assert usage_ledger.retry_after("alice") is None
+        assert usage_ledger.retry_after("alice", BULK) == 7
+        clock.now += 2
+        usage_ledger.record("gemini-a", tokens(40, 0))
+
+    # Interactive turns wait for the oldest bucket to leave the window, bulk ones for the two oldest
+    assert usage_ledger.retry_after("alice") == 5
+    assert usage_ledger.retry_after("alice", BULK) == 8
+    clock.now += 5
+    assert usage_ledger.retry_after("alice") is None
+    assert usage_ledger.retry_after("alice", BULK) == 3
+    clock.now += 3
+    assert usage_ledger.retry_after("alice") is None
+    assert usage_ledger.retry_after("alice", BULK) is None
+
+    # Without a budget nobody waits
+    unlimited, _ = ledger(monkeypatch)
+    assert unlimited.retry_after("alice") is None
+
+
+def test_turn_totals_include_every_model(monkeypatch):
+    usage_ledger, _ = ledger(monkeypatch)
+    with work_context(INTERACTIVE, "alice", session_id="s1"):
+        usage_ledger.record("gemini-a", tokens(100, 0))
+        with track_turn() as turn:
+            usage_ledger.record("gemini-a", tokens(10, 5))
+            usage_ledger.record("gemini-b", tokens(20, 0))
+            usage_ledger.record("gemini-a", tokens(1, 1))
+        usage_ledger.record("gemini-b", tokens(50, 0))
+        report = usage_ledger.report(turn)
+
+    assert turn.calls == 3
+    assert turn.tokens == {"prompt": 31, "completion": 6, "total": 37}
+    assert turn.to_langfuse() == {"input": 31, "output": 6, "total": 37, "unit": "TOKENS"}
+    assert report["tokens_by_model"] == {
+        "gemini-a": {"prompt": 11, "completion": 6, "total": 17},
+        "gemini-b": {"prompt": 20, "completion": 0, "total": 20},
+    }
+    assert report["user_window_tokens"] == report["session_window_tokens"] == 187